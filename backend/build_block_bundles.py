@@ -0,0 +1,141 @@
+"""
+Build precomputed block-definition bundles for the PyForge scanner.
+
+Each bundle is what /api/scanner/scan would return for one module, stored
+gzip-compressed as data/block_bundles/<module>-<version>.json.gz and listed
+in index.json. The server serves them as static files and answers scans from
+them while the installed version still matches, so common palettes load
+without importing anything in the server.
+
+    python backend/build_block_bundles.py                 # stdlib + popular packages
+    python backend/build_block_bundles.py numpy pandas    # just these
+    python backend/build_block_bundles.py --no-stdlib --no-popular mypkg
+
+Packages that aren't installed are skipped. Modules are introspected by
+introspect_worker.py, one child process each, so nothing is imported here.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+INTROSPECT_WORKER_PATH = ROOT_DIR / 'introspect_worker.py'
+DEFAULT_OUT = Path(os.environ.get('PYFORGE_BLOCK_BUNDLES_DIR') or ROOT_DIR.parent / 'data' / 'block_bundles')
+
+# Bundled unless --no-popular; override with PYFORGE_BUNDLE_PACKAGES (comma separated)
+POPULAR_PACKAGES = [
+    p.strip() for p in os.environ.get('PYFORGE_BUNDLE_PACKAGES', (
+        'numpy,pandas,matplotlib,scipy,requests,PIL,flask,sklearn,'
+        'bs4,yaml,pygame,tqdm,rich,click,sympy,networkx,cv2'
+    )).split(',') if p.strip()
+]
+
+# Stdlib modules with side effects on import or nothing useful to show
+STDLIB_SKIP = {'antigravity', 'this', 'idlelib', 'turtledemo', 'pydoc_data', 'ensurepip', 'lib2to3'}
+
+PYTHON_TAG = f"python-{sys.version_info.major}.{sys.version_info.minor}"
+
+
+def stdlib_modules() -> list:
+    names = getattr(sys, 'stdlib_module_names', ())
+    return sorted(n for n in names if not n.startswith('_') and n not in STDLIB_SKIP)
+
+
+def scan(module_name: str, timeout: float):
+    """Run the introspection worker; returns its scan result, or None if unavailable."""
+    try:
+        proc = subprocess.run(
+            [sys.executable, str(INTROSPECT_WORKER_PATH), 'scan', module_name],
+            stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        print(f"  {module_name}: timed out", file=sys.stderr)
+        return None
+    if proc.returncode != 0:
+        lines = proc.stderr.decode('utf-8', errors='replace').strip().splitlines()
+        print(f"  {module_name}: failed ({lines[-1] if lines else proc.returncode})", file=sys.stderr)
+        return None
+    result = json.loads(proc.stdout)
+    return None if "error" in result else result
+
+
+def write_bundle(out_dir: Path, module_name: str, result: dict, stdlib: set) -> dict:
+    version = result.get("version") or (PYTHON_TAG if module_name.split('.')[0] in stdlib else "unknown")
+    result["version"] = version
+    raw = json.dumps(result, separators=(',', ':')).encode('utf-8')
+    # mtime=0 keeps the output, and so the ETag, identical across rebuilds
+    data = gzip.compress(raw, compresslevel=9, mtime=0)
+    filename = f"{module_name}-{version}.json.gz"
+    tmp = out_dir / f".{filename}.tmp"
+    tmp.write_bytes(data)
+    os.replace(tmp, out_dir / filename)
+    return {
+        "version": version,
+        "file": filename,
+        "etag": hashlib.sha256(data).hexdigest()[:32],
+        "size": len(data),
+        "raw_size": len(raw),
+        "blocks": len(result.get("block_definitions", [])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute block-definition bundles for the scanner.")
+    parser.add_argument('modules', nargs='*', help="modules to bundle (default: stdlib and popular packages)")
+    parser.add_argument('--out', type=Path, default=DEFAULT_OUT, help=f"output directory (default: {DEFAULT_OUT})")
+    parser.add_argument('--no-stdlib', action='store_true', help="skip the standard library")
+    parser.add_argument('--no-popular', action='store_true', help="skip the popular package list")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 2, help="modules introspected at once")
+    parser.add_argument('--timeout', type=float, default=120, help="seconds allowed per module")
+    args = parser.parse_args()
+
+    stdlib = set(stdlib_modules())
+    modules = list(args.modules)
+    if not args.modules:
+        if not args.no_stdlib:
+            modules += sorted(stdlib)
+        if not args.no_popular:
+            modules += POPULAR_PACKAGES
+    modules = list(dict.fromkeys(modules))
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    index_path = args.out / 'index.json'
+    try:
+        index = json.loads(index_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        index = {"bundles": {}}
+
+    print(f"Bundling {len(modules)} module(s) into {args.out}")
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = pool.map(lambda name: (name, scan(name, args.timeout)), modules)
+        for name, result in results:
+            if result is None:
+                continue
+            entry = write_bundle(args.out, name, result, stdlib)
+            index["bundles"][name] = entry
+            print(f"  {name} {entry['version']}: {entry['blocks']} blocks, {entry['size']} bytes")
+
+    index["python"] = PYTHON_TAG
+    index["generated_at"] = datetime.now(timezone.utc).isoformat()
+    tmp = args.out / '.index.json.tmp'
+    tmp.write_text(json.dumps(index, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, index_path)
+
+    # Drop bundles for versions that are no longer listed
+    current = {entry["file"] for entry in index["bundles"].values()}
+    for path in args.out.glob('*.json.gz'):
+        if path.name not in current:
+            path.unlink()
+    print(f"{len(index['bundles'])} bundle(s) listed in {index_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Pre-warmed interpreter for PyForge code execution.
+
+The server keeps a few of these processes started ahead of time (see
+InterpreterPool in server.py). Each one imports the modules user programs
+commonly need and then blocks until a single job arrives on stdin: one JSON
+header line followed by the program source and, when the server had it
+compiled already, the marshalled code object. The program runs as __main__
+with this process's stdout/stderr, and the process exits with the program's
+exit code, so every run gets a fresh interpreter.
+
+On Linux the job's resource limits are applied before the program starts.
+When started with --status-fd, one JSON line is written there when the
+program starts (its CPU baseline) and one with CPU time and peak memory on
+exit, including exits from hitting the CPU limit. For runs the server
+kills, it measures the rest itself.
+"""
+
+import atexit
+import json
+import linecache
+import marshal
+import os
+import signal
+import sys
+import time
+import traceback
+import types
+
+# Running as a script puts backend/ on sys.path; keep server modules out of reach
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.curdir) != SCRIPT_DIR]
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Imported before the job arrives so programs don't pay for them
+WARM_MODULES = (
+    "math", "random", "json", "re", "string", "time", "datetime",
+    "collections", "itertools", "functools", "pathlib", "typing",
+    "dataclasses", "decimal", "fractions", "statistics", "textwrap",
+)
+
+PROGRAM_FILENAME = "main.py"
+
+
+def warm_up():
+    for name in WARM_MODULES:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+
+def read_job():
+    """Block until the server sends a job; exit quietly if it never does."""
+    header = sys.stdin.buffer.readline()
+    if not header:
+        sys.exit(0)
+    job = json.loads(header)
+    source = sys.stdin.buffer.read(job["size"]).decode("utf-8")
+    bytecode = sys.stdin.buffer.read(job["bytecode_size"]) if job.get("bytecode_size") else None
+    return job, source, bytecode
+
+
+def apply_limits(limits: dict):
+    """Cap CPU seconds, address space, open files and (if configured) processes for the run.
+
+    The process cap is RLIMIT_NPROC, which counts all of the user's processes
+    and threads rather than this run's, so it only suits a dedicated account.
+    """
+    if resource is None or not limits:
+        return
+    cpu = limits.get("cpu_seconds")
+    if cpu:
+        # Don't charge the warm-up to the program
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + 1 + int(cpu)
+        set_limit(resource.RLIMIT_CPU, soft, soft + 1)
+    for key, name in (("memory_bytes", "RLIMIT_AS"), ("open_files", "RLIMIT_NOFILE"), ("processes", "RLIMIT_NPROC")):
+        value = limits.get(key)
+        if value and hasattr(resource, name):
+            set_limit(getattr(resource, name), int(value), int(value))
+
+
+def set_limit(which, soft: int, hard: int):
+    _, current_hard = resource.getrlimit(which)
+    if current_hard != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current_hard), min(hard, current_hard)
+    try:
+        resource.setrlimit(which, (soft, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def cpu_seconds() -> float:
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def write_status(status_fd: int, message: dict):
+    try:
+        os.write(status_fd, json.dumps(message).encode("utf-8") + b"\n")
+    except OSError:
+        pass
+
+
+def report_usage(status_fd: int, cpu_baseline: float):
+    """Write the run's resource usage to the server's status pipe."""
+    usage = {"cpu_time": round(max(0.0, cpu_seconds() - cpu_baseline), 6), "peak_rss": None}
+    if resource is not None:
+        peak = max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        )
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        usage["peak_rss"] = peak if sys.platform == "darwin" else peak * 1024
+    write_status(status_fd, usage)
+
+
+def report_on_cpu_limit(status_fd: int, cpu_baseline: float):
+    """Report usage when RLIMIT_CPU's SIGXCPU arrives, then die of it as before."""
+    if not hasattr(signal, "SIGXCPU"):
+        return
+
+    def on_sigxcpu(signum, frame):
+        atexit.unregister(report_usage)
+        report_usage(status_fd, cpu_baseline)
+        signal.signal(signal.SIGXCPU, signal.SIG_DFL)
+        os.kill(os.getpid(), signal.SIGXCPU)
+
+    signal.signal(signal.SIGXCPU, on_sigxcpu)
+
+
+def status_fd_from_argv():
+    if "--status-fd" in sys.argv:
+        return int(sys.argv[sys.argv.index("--status-fd") + 1])
+    return None
+
+
+def detach_stdin():
+    """Give the program an empty stdin instead of the job pipe."""
+    devnull = open(os.devnull, "r")
+    os.dup2(devnull.fileno(), 0)
+    sys.stdin = devnull
+
+
+def run_program(source: str, bytecode: bytes = None):
+    main = types.ModuleType("__main__")
+    main.__file__ = PROGRAM_FILENAME
+    main.__builtins__ = __builtins__
+    sys.modules["__main__"] = main
+    sys.argv = [PROGRAM_FILENAME]
+    # Like `python main.py`, modules next to the program are importable
+    sys.path.insert(0, os.getcwd())
+    # Let tracebacks show the program's source lines
+    linecache.cache[PROGRAM_FILENAME] = (len(source), None, source.splitlines(True), PROGRAM_FILENAME)
+
+    try:
+        if bytecode is not None:
+            code = marshal.loads(bytecode)
+        else:
+            code = compile(source, PROGRAM_FILENAME, "exec")
+        exec(code, main.__dict__)
+    except SystemExit:
+        raise
+    except BaseException:
+        # Report the error the way `python main.py` would, without our frames
+        exc_type, exc, tb = sys.exc_info()
+        while tb is not None and tb.tb_frame.f_code.co_filename == __file__:
+            tb = tb.tb_next
+        traceback.print_exception(exc_type, exc, tb)
+        sys.exit(1)
+
+
+def main():
+    status_fd = status_fd_from_argv()
+    warm_up()
+    job, source, bytecode = read_job()
+    detach_stdin()
+    apply_limits(job.get("limits"))
+    if status_fd is not None:
+        cpu_baseline = cpu_seconds()
+        start = {"cpu_baseline": cpu_baseline}
+        if resource is not None:
+            cpu_limit = resource.getrlimit(resource.RLIMIT_CPU)[1]
+            if cpu_limit != resource.RLIM_INFINITY:
+                start["cpu_limit"] = cpu_limit
+        write_status(status_fd, start)
+        atexit.register(report_usage, status_fd, cpu_baseline)
+        report_on_cpu_limit(status_fd, cpu_baseline)
+    run_program(source, bytecode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Package introspection for the PyForge scanner.
+
+Importing a package to look at its members can take seconds (numpy, pandas)
+and leaves it imported for good, so the server runs this script in a child
+process instead of doing it on its event loop:
+
+    python introspect_worker.py scan <package>      # members and block definitions
+    python introspect_worker.py summary <module>    # functions/classes/constants for scan-imports
+    python introspect_worker.py members <module>    # every public name and its kind
+    python introspect_worker.py signature <module> <member>
+
+The result is written to stdout as a single JSON object. Anything the package
+prints while being imported goes to stderr. A package that can't be imported
+is reported as {"error": "not_found", "detail": ...}.
+"""
+
+import inspect
+import json
+import os
+import sys
+
+# Running as a script puts backend/ on sys.path; keep server modules out of reach
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.curdir) != SCRIPT_DIR]
+
+MAX_MODULES = 50
+MAX_BLOCKS = 30
+
+
+def public_members(obj, also=()):
+    """Yield (name, value) for public attributes in dir() order, one at a time.
+
+    Unlike inspect.getmembers nothing is evaluated ahead of the caller, so
+    stopping early leaves the rest untouched; attributes a module provides
+    lazily through __getattr__ are only loaded once the walk reaches them.
+    """
+    for name in dir(obj):
+        if name.startswith('_') and name not in also:
+            continue
+        try:
+            yield name, getattr(obj, name)
+        except Exception:
+            continue
+
+
+def member_kind(value) -> str:
+    if inspect.isclass(value):
+        return "class"
+    if inspect.ismodule(value):
+        return "module"
+    if inspect.isfunction(value) or inspect.isbuiltin(value):
+        return "function"
+    if callable(value):
+        return "callable"
+    return "constant"
+
+
+def parameters(func) -> list:
+    try:
+        sig = inspect.signature(func)
+    except (ValueError, TypeError):
+        return []
+    return [
+        {"name": p.name, "default": str(p.default) if p.default != inspect.Parameter.empty else None}
+        for p in sig.parameters.values()
+    ]
+
+
+def scan(package_name: str) -> dict:
+    """Describe a package's public members and build block definitions for its functions."""
+    import importlib
+
+    try:
+        mod = importlib.import_module(package_name)
+    except ImportError as e:
+        return {"error": "not_found", "detail": str(e)}
+
+    modules = []
+    block_defs = []
+
+    for name, obj in public_members(mod):
+        is_function = inspect.isfunction(obj) or inspect.isbuiltin(obj)
+        if len(modules) >= MAX_MODULES and (len(block_defs) >= MAX_BLOCKS or not is_function):
+            if len(block_defs) >= MAX_BLOCKS:
+                break
+            continue
+
+        entry = {"name": name, "type": type(obj).__name__}
+
+        if is_function:
+            entry["type"] = "function"
+            entry["params"] = parameters(obj)
+
+            if len(block_defs) < MAX_BLOCKS:
+                block_defs.append({
+                    "type": f"{package_name}_{name}",
+                    "message0": f"{package_name}.{name}(" + " ".join(f"%{i+1}" for i in range(len(entry["params"]))) + ")",
+                    "args0": [
+                        {"type": "input_value", "name": p["name"].upper(), "check": None}
+                        for p in entry["params"]
+                    ],
+                    "output": None,
+                    "colour": 160,
+                    "tooltip": f"Call {package_name}.{name}",
+                    "helpUrl": ""
+                })
+
+        elif inspect.isclass(obj):
+            entry["type"] = "class"
+            entry["methods"] = [m for m, value in public_members(obj) if callable(value)]
+
+        if len(modules) < MAX_MODULES:
+            modules.append(entry)
+
+    return {
+        "package_name": package_name,
+        "version": distribution_version(package_name),
+        "modules": modules,
+        "block_definitions": block_defs,
+    }
+
+
+def summary(module_name: str) -> dict:
+    """Summarize a module's functions, classes and constants for generated import blocks."""
+    import importlib
+
+    try:
+        mod = importlib.import_module(module_name)
+    except ImportError as e:
+        return {"error": "not_found", "detail": str(e)}
+
+    info = {
+        "name": module_name,
+        "available": True,
+        "installed": False,
+        "functions": [],
+        "classes": [],
+        "constants": [],
+    }
+
+    try:
+        # Limit inspection to prevent timeout on large modules like 'os'
+        member_count = 0
+        max_members = 100
+
+        for name, obj in public_members(mod):
+            member_count += 1
+            if member_count > max_members:
+                break
+
+            if inspect.isfunction(obj) or inspect.isbuiltin(obj):
+                if len(info["functions"]) >= 30:
+                    continue
+                func_info = {"name": name, "type": "function"}
+                try:
+                    sig = inspect.signature(obj)
+                    func_info["params"] = [
+                        p.name for p in list(sig.parameters.values())[:10]
+                        if p.name != 'self'
+                    ]
+                except (ValueError, TypeError):
+                    func_info["params"] = []
+                info["functions"].append(func_info)
+
+            elif inspect.isclass(obj):
+                if len(info["classes"]) >= 10:
+                    continue
+                cls_info = {"name": name, "type": "class", "methods": []}
+                method_count = 0
+                for mname, mobj in public_members(obj, also=('__init__',)):
+                    if callable(mobj):
+                        method_count += 1
+                        if method_count > 10:
+                            break
+                        cls_info["methods"].append({"name": mname, "params": []})
+                info["classes"].append(cls_info)
+
+            elif not callable(obj):
+                if len(info["constants"]) >= 15:
+                    continue
+                info["constants"].append({"name": name, "type": type(obj).__name__})
+    except Exception:
+        pass
+
+    return info
+
+
+def members(module_name: str) -> dict:
+    """List every public name of a module with its kind, without resolving lazy attributes."""
+    import importlib
+
+    try:
+        mod = importlib.import_module(module_name)
+    except ImportError as e:
+        return {"error": "not_found", "detail": str(e)}
+
+    namespace = vars(mod)
+    return {
+        "module": module_name,
+        "members": [
+            {"name": name, "kind": member_kind(namespace[name]) if name in namespace else "lazy"}
+            for name in dir(mod) if not name.startswith('_')
+        ],
+    }
+
+
+def signature(module_name: str, member: str) -> dict:
+    """Resolve one member (dotted paths reach into classes) and describe its call signature."""
+    import importlib
+
+    try:
+        obj = importlib.import_module(module_name)
+    except ImportError as e:
+        return {"error": "not_found", "detail": str(e)}
+    for part in member.split('.'):
+        try:
+            obj = getattr(obj, part)
+        except Exception:
+            return {"error": "not_found", "detail": f"'{module_name}' has no member '{member}'"}
+
+    try:
+        sig = str(inspect.signature(obj))
+    except (ValueError, TypeError):
+        sig = None
+    doc = inspect.getdoc(obj) or ""
+    return {
+        "module": module_name,
+        "name": member,
+        "kind": member_kind(obj),
+        "signature": sig,
+        "params": parameters(obj) if callable(obj) else [],
+        "doc": doc.split("\n\n")[0],
+    }
+
+
+def distribution_version(module_name: str):
+    from importlib import metadata
+
+    top_level = module_name.split('.')[0]
+    for dist_name in metadata.packages_distributions().get(top_level, []):
+        try:
+            return metadata.version(dist_name)
+        except metadata.PackageNotFoundError:
+            continue
+    return None
+
+
+COMMANDS = {"scan": scan, "summary": summary, "members": members, "signature": signature}
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in COMMANDS:
+        sys.stderr.write(f"usage: {sys.argv[0]} {{{','.join(COMMANDS)}}} <module> [args...]\n")
+        sys.exit(2)
+
+    # Keep stdout for the result; stray prints from imported packages go to stderr
+    result_fd = os.dup(1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    result = COMMANDS[sys.argv[1]](*sys.argv[2:])
+    with os.fdopen(result_fd, "w", encoding="utf-8") as out:
+        json.dump(result, out, default=str)
+
+
+if __name__ == "__main__":
+    main()
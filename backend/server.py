@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Query, Header, Request, Response
 from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
@@ -10,14 +10,27 @@ import subprocess
 import asyncio
 import json
 import sys
-import tempfile
 import signal
+import time
+import re
+import base64
+import hashlib
+import struct
+import zlib
+import gzip
+import codecs
+import marshal
+import tempfile
+import threading
 from pathlib import Path
+from contextlib import asynccontextmanager
+from collections import OrderedDict, deque
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, NamedTuple
 import uuid
 from datetime import datetime, timezone
 import aiosqlite
+import sqlite3
 
 # Set DISPLAY for pyautogui (Linux)
 if sys.platform != 'win32' and 'DISPLAY' not in os.environ:
@@ -39,25 +52,181 @@ except ImportError:
     STREAM_AVAILABLE = False
     logging.warning("Stream server not available")
 
+# Optional zstd compression for stored workspaces (zlib is used otherwise)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Database setup
 DB_PATH = ROOT_DIR.parent / 'data' / 'projects.db'
+# Custom blocks used to live here; it is imported into the database on startup
 CUSTOM_BLOCKS_PATH = ROOT_DIR.parent / 'data' / 'custom_blocks.json'
 FRONTEND_BUILD_PATH = ROOT_DIR.parent / 'frontend' / 'build'
 
+# Number of read-only SQLite connections kept open for list/get requests
+DB_READ_POOL_SIZE = int(os.environ.get('PYFORGE_DB_READERS', '4'))
+# Workspace revisions kept per project (older ones are pruned on save)
+WORKSPACE_HISTORY_LIMIT = int(os.environ.get('PYFORGE_WORKSPACE_HISTORY', '50'))
+# Interpreters kept started and warmed for code execution (0 disables the pool)
+EXEC_POOL_SIZE = int(os.environ.get('PYFORGE_EXEC_POOL_SIZE', '2'))
+EXEC_WORKER_PATH = ROOT_DIR / 'exec_worker.py'
+EXEC_PROGRAM_FILENAME = 'main.py'  # same as exec_worker.PROGRAM_FILENAME
+# Working directory for runs, and how many compiled programs are kept for reruns
+EXEC_WORKDIR = os.environ.get('PYFORGE_EXEC_WORKDIR') or tempfile.gettempdir()
+EXEC_BYTECODE_CACHE_SIZE = int(os.environ.get('PYFORGE_EXEC_BYTECODE_CACHE', '256'))
+EXEC_BYTECODE_MAX_SOURCE = int(os.environ.get('PYFORGE_EXEC_BYTECODE_MAX_SOURCE_KB', '256')) * 1024
+# Runs allowed at once, and how many more may wait (overall and per client)
+EXEC_MAX_CONCURRENT = int(os.environ.get('PYFORGE_EXEC_MAX_CONCURRENT', str(os.cpu_count() or 2)))
+EXEC_MAX_QUEUED = int(os.environ.get('PYFORGE_EXEC_MAX_QUEUED', '32'))
+EXEC_MAX_QUEUED_PER_CLIENT = int(os.environ.get('PYFORGE_EXEC_MAX_QUEUED_PER_CLIENT', '4'))
+# Per-run limits: wall clock and output everywhere, rlimits on Linux (0 disables one)
+EXEC_TIMEOUT = float(os.environ.get('PYFORGE_EXEC_TIMEOUT', '30'))
+EXEC_MAX_OUTPUT_BYTES = int(os.environ.get('PYFORGE_EXEC_MAX_OUTPUT_BYTES', str(1024 * 1024)))
+EXEC_RLIMITS = {
+    "cpu_seconds": int(os.environ.get('PYFORGE_EXEC_CPU_SECONDS', '20')),
+    "memory_bytes": int(os.environ.get('PYFORGE_EXEC_MEMORY_MB', '1024')) * 1024 * 1024,
+    "open_files": int(os.environ.get('PYFORGE_EXEC_MAX_OPEN_FILES', '256')),
+    # RLIMIT_NPROC counts every process and thread of the server's user, not
+    # just this run's, and root ignores it, so it is off unless set
+    "processes": int(os.environ.get('PYFORGE_EXEC_MAX_PROCESSES', '0')),
+} if sys.platform.startswith('linux') else {}
+# Live output over /api/ws/output: its own output cap, a frame every flush
+# interval or once a full batch is pending, and a bounded send buffer
+EXEC_STREAM_MAX_OUTPUT_BYTES = int(os.environ.get('PYFORGE_EXEC_STREAM_MAX_OUTPUT_BYTES', str(8 * 1024 * 1024)))
+OUTPUT_FLUSH_INTERVAL = float(os.environ.get('PYFORGE_OUTPUT_FLUSH_MS', '16')) / 1000
+OUTPUT_FLUSH_BYTES = int(os.environ.get('PYFORGE_OUTPUT_FLUSH_BYTES', str(64 * 1024)))
+OUTPUT_SEND_BUFFER_BYTES = int(os.environ.get('PYFORGE_OUTPUT_SEND_BUFFER_BYTES', str(256 * 1024)))
+
+# Package scanning runs in child processes; results are cached per installed version
+INTROSPECT_WORKER_PATH = ROOT_DIR / 'introspect_worker.py'
+SCAN_CACHE_DIR = ROOT_DIR.parent / 'data' / 'scan_cache'
+SCAN_TIMEOUT = float(os.environ.get('PYFORGE_SCAN_TIMEOUT', '60'))
+SCAN_MAX_CONCURRENT = int(os.environ.get('PYFORGE_SCAN_MAX_CONCURRENT', '2'))
+SCAN_CACHE_MAX_BYTES = int(os.environ.get('PYFORGE_SCAN_CACHE_MAX_MB', '64')) * 1024 * 1024
+# Prebuilt scan results (see build_block_bundles.py), used while the installed version matches
+BLOCK_BUNDLES_DIR = Path(os.environ.get('PYFORGE_BLOCK_BUNDLES_DIR') or ROOT_DIR.parent / 'data' / 'block_bundles')
+PYTHON_TAG = f"python-{sys.version_info.major}.{sys.version_info.minor}"  # stdlib bundle version
+# One pip run installs every missing import found in a scan
+PIP_INSTALL_TIMEOUT = float(os.environ.get('PYFORGE_PIP_TIMEOUT', '180'))
+# Sessions whose last scan-imports result is kept for incremental rescans
+IMPORT_SCAN_SESSIONS = int(os.environ.get('PYFORGE_IMPORT_SCAN_SESSIONS', '256'))
+
+# Largest file /files/save and /files/save-stream will write
+FILE_SAVE_MAX_BYTES = int(os.environ.get('PYFORGE_FILE_SAVE_MAX_MB', '64')) * 1024 * 1024
+# Directory listings for the file picker are reused for this long while the directory's mtime holds
+DIR_LISTING_TTL = float(os.environ.get('PYFORGE_DIR_LISTING_TTL', '5'))
+DIR_LISTING_CACHE_SIZE = 128
+
+# Terminal output is read from the event loop and sent in frames of up to
+# TERMINAL_FRAME_BYTES, at most one per flush interval while output keeps coming
+TERMINAL_FLUSH_INTERVAL = float(os.environ.get('PYFORGE_TERMINAL_FLUSH_MS', '8')) / 1000
+TERMINAL_FRAME_BYTES = 64 * 1024
+TERMINAL_BUFFER_BYTES = 256 * 1024
+# Output a client may have sent but not yet acknowledged before PTY reads pause
+TERMINAL_WINDOW_BYTES = int(os.environ.get('PYFORGE_TERMINAL_WINDOW_KB', '512')) * 1024
+# Shells outlive their connection for this long, keeping recent output to replay on reattach
+TERMINAL_IDLE_TIMEOUT = float(os.environ.get('PYFORGE_TERMINAL_IDLE_TIMEOUT', '600'))
+TERMINAL_SCROLLBACK_BYTES = int(os.environ.get('PYFORGE_TERMINAL_SCROLLBACK_KB', '256')) * 1024
+
 # Ensure data directory exists
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
+# ─── Database Connection Pool ────────────────────────────────────────────────
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+)
+
+class SQLitePool:
+    """App-lifetime SQLite connections: one serialized writer plus a pool of readers.
+
+    The database runs in WAL mode, so readers never wait behind a commit in
+    progress. Every connection keeps its own prepared-statement cache, which is
+    why handlers use the module-level SQL constants below instead of building
+    query strings per request.
+    """
+
+    def __init__(self, path: Path, readers: int = 4):
+        self.path = path
+        self.readers = max(1, readers)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._connections: List[aiosqlite.Connection] = []
+
+    async def _connect(self, read_only: bool) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.path, cached_statements=256)
+        db.row_factory = aiosqlite.Row
+        for pragma in SQLITE_PRAGMAS:
+            await db.execute(pragma)
+        if read_only:
+            await db.execute("PRAGMA query_only = ON")
+        self._connections.append(db)
+        return db
+
+    async def open(self):
+        # Locks and queues are created here so they bind to the server's loop
+        self._write_lock = asyncio.Lock()
+        self._idle = asyncio.Queue()
+        self._writer = await self._connect(read_only=False)
+        for _ in range(self.readers):
+            self._idle.put_nowait(await self._connect(read_only=True))
+
+    async def close(self):
+        if self._writer is not None:
+            try:
+                await self._writer.execute("PRAGMA optimize")
+            except Exception:
+                pass
+        for db in self._connections:
+            try:
+                await db.close()
+            except Exception:
+                pass
+        self._connections.clear()
+        self._writer = None
+        self._idle = None
+
+    @asynccontextmanager
+    async def read(self):
+        """Borrow a read-only connection for the duration of the block."""
+        db = await self._idle.get()
+        try:
+            yield db
+        finally:
+            self._idle.put_nowait(db)
+
+    @asynccontextmanager
+    async def write(self):
+        """Run the block as one transaction on the writer connection."""
+        async with self._write_lock:
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+db_pool = SQLitePool(DB_PATH, readers=DB_READ_POOL_SIZE)
+
 # ─── Database Initialization ──────────────────────────────────────────────────
 
 async def init_db():
     """Initialize SQLite database for projects."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.write() as db:
         await db.execute("""
             CREATE TABLE IF NOT EXISTS projects (
                 id TEXT PRIMARY KEY,
@@ -68,21 +237,416 @@ async def init_db():
                 updated_at TEXT NOT NULL
             )
         """)
-        await db.commit()
+        # Workspaces live in a content-addressed blob table; `workspace_xml`
+        # is kept only so older databases can be migrated in place.
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS workspace_blobs (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                raw_size INTEGER NOT NULL,
+                data BLOB NOT NULL
+            ) WITHOUT ROWID
+        """)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS project_revisions (
+                project_id TEXT NOT NULL,
+                revision INTEGER NOT NULL,
+                blob_hash TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (project_id, revision)
+            ) WITHOUT ROWID
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_project_revisions_blob ON project_revisions (blob_hash)"
+        )
+        added = await ensure_columns(db, "projects", {
+            "xml_size": "INTEGER NOT NULL DEFAULT 0",
+            "block_count": "INTEGER NOT NULL DEFAULT 0",
+            "workspace_hash": "TEXT",
+            "revision": "INTEGER NOT NULL DEFAULT 0",
+            "version": "INTEGER NOT NULL DEFAULT 1",
+        })
+        if "xml_size" in added:
+            # Backfill listing stats for projects saved before the columns existed
+            async with db.execute("SELECT id, workspace_xml FROM projects") as cursor:
+                rows = await cursor.fetchall()
+            await db.executemany(
+                "UPDATE projects SET xml_size = ?, block_count = ? WHERE id = ?",
+                [(*workspace_stats(row["workspace_xml"] or ""), row["id"]) for row in rows]
+            )
+        await migrate_inline_workspaces(db)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS custom_blocks (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                params TEXT NOT NULL DEFAULT '[]',
+                body_code TEXT NOT NULL DEFAULT '',
+                description TEXT NOT NULL DEFAULT '',
+                color TEXT NOT NULL DEFAULT '#8b5cf6',
+                created_at TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_custom_blocks_name ON custom_blocks (name)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_custom_blocks_created ON custom_blocks (created_at, id)")
+        blocks_migrated = await migrate_custom_blocks_file(db)
+        # Backs the ORDER BY of the project listing and its keyset pagination
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects (updated_at DESC, id DESC)"
+        )
+        # Lets blob garbage collection check whether a project still uses a blob
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_projects_workspace_hash ON projects (workspace_hash)"
+        )
+        # Drop blobs no longer referenced by a project or a kept revision
+        await db.execute("""
+            DELETE FROM workspace_blobs
+            WHERE hash NOT IN (SELECT blob_hash FROM project_revisions)
+              AND hash NOT IN (SELECT workspace_hash FROM projects WHERE workspace_hash IS NOT NULL)
+        """)
+    if blocks_migrated:
+        CUSTOM_BLOCKS_PATH.replace(CUSTOM_BLOCKS_PATH.with_name(CUSTOM_BLOCKS_PATH.name + ".migrated"))
+
+async def fetch_column(db: aiosqlite.Connection, sql: str, params: tuple) -> list:
+    async with db.execute(sql, params) as cursor:
+        return [row[0] for row in await cursor.fetchall()]
+
+async def delete_orphaned_blobs(db: aiosqlite.Connection, hashes: list):
+    """Drop those of `hashes` that no project or kept revision refers to any more."""
+    await db.executemany(SQL_DELETE_ORPHANED_BLOB, [(h, h, h) for h in set(hashes)])
+
+async def ensure_columns(db: aiosqlite.Connection, table: str, columns: Dict[str, str]) -> List[str]:
+    """Add any missing columns to an existing table, returning the ones added."""
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        existing = {row["name"] for row in await cursor.fetchall()}
+    added = []
+    for name, decl in columns.items():
+        if name not in existing:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+            added.append(name)
+    return added
+
+async def migrate_inline_workspaces(db: aiosqlite.Connection):
+    """Move workspace XML stored inline on `projects` into the blob table."""
+    async with db.execute(
+        "SELECT id, workspace_xml, updated_at FROM projects WHERE workspace_xml != '' AND workspace_hash IS NULL"
+    ) as cursor:
+        rows = await cursor.fetchall()
+    for row in rows:
+        blob = pack_workspace(row["workspace_xml"])
+        await db.execute(SQL_INSERT_BLOB, (blob.hash, blob.codec, blob.raw_size, blob.data))
+        await db.execute(
+            "UPDATE projects SET workspace_xml = '', workspace_hash = ?, revision = 1 WHERE id = ?",
+            (blob.hash, row["id"])
+        )
+        await db.execute(
+            "INSERT OR IGNORE INTO project_revisions (project_id, revision, blob_hash, created_at) VALUES (?, 1, ?, ?)",
+            (row["id"], blob.hash, row["updated_at"])
+        )
+    if rows:
+        logging.info(f"Moved {len(rows)} inline workspace(s) into blob storage")
+
+# ─── Workspace Blob Storage ──────────────────────────────────────────────────
+
+BLOCK_TAG_RE = re.compile(r"<block[\s>]")
+
+def workspace_stats(workspace_xml: str) -> tuple:
+    """Return (stored size in bytes, number of blocks) for a Blockly workspace."""
+    return len(workspace_xml.encode("utf-8")), len(BLOCK_TAG_RE.findall(workspace_xml))
+
+class WorkspaceBlob(NamedTuple):
+    hash: str
+    codec: str
+    raw_size: int
+    block_count: int
+    data: bytes
+
+def pack_workspace(workspace_xml: str) -> WorkspaceBlob:
+    """Hash and compress workspace XML for the content-addressed blob table."""
+    raw = workspace_xml.encode("utf-8")
+    if ZSTD_AVAILABLE:
+        codec, data = "zstd", zstandard.ZstdCompressor(level=9).compress(raw)
+    else:
+        codec, data = "zlib", zlib.compress(raw, 6)
+    return WorkspaceBlob(
+        hash=hashlib.sha256(raw).hexdigest(),
+        codec=codec,
+        raw_size=len(raw),
+        block_count=len(BLOCK_TAG_RE.findall(workspace_xml)),
+        data=data,
+    )
+
+def unpack_workspace(codec: Optional[str], data: Optional[bytes]) -> str:
+    """Inverse of pack_workspace; a missing blob is an empty workspace."""
+    if data is None:
+        return ""
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise HTTPException(status_code=500, detail="Workspace is zstd-compressed but zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "zlib":
+        raw = zlib.decompress(data)
+    else:
+        raw = data
+    return raw.decode("utf-8")
+
+def apply_workspace_delta(base: str, edits: List["WorkspaceEdit"]) -> str:
+    """Apply non-overlapping splice edits to the base workspace XML.
+
+    Offsets count UTF-16 code units so they line up with JavaScript string
+    indices on the client.
+    """
+    units = base.encode("utf-16-le")
+    total = len(units) // 2
+    parts = []
+    pos = 0
+    for edit in sorted(edits, key=lambda e: (e.start, e.end)):
+        if edit.start < pos or edit.end < edit.start or edit.end > total:
+            raise HTTPException(status_code=400, detail="Invalid workspace delta")
+        parts.append(units[2 * pos:2 * edit.start])
+        parts.append(edit.text.encode("utf-16-le"))
+        pos = edit.end
+    parts.append(units[2 * pos:])
+    try:
+        return b"".join(parts).decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Workspace delta splits a character")
+
+# Statements reused verbatim so each pooled connection keeps them prepared
+SQL_INSERT_PROJECT = (
+    "INSERT INTO projects (id, name, description, workspace_xml, created_at, updated_at, xml_size, block_count) "
+    "VALUES (?, ?, ?, '', ?, ?, 0, 0)"
+)
+SQL_PROJECT_WITH_WORKSPACE = (
+    "SELECT p.id, p.name, p.description, p.created_at, p.updated_at, p.revision, p.version, "
+    "p.workspace_hash, b.codec, b.data "
+    "FROM projects p LEFT JOIN workspace_blobs b ON b.hash = p.workspace_hash"
+)
+SQL_LIST_PROJECTS = f"{SQL_PROJECT_WITH_WORKSPACE} ORDER BY p.updated_at DESC"
+SQL_PROJECT_SUMMARY_COLUMNS = "id, name, description, created_at, updated_at, xml_size, block_count"
+SQL_LIST_PROJECT_SUMMARIES = (
+    f"SELECT {SQL_PROJECT_SUMMARY_COLUMNS} FROM projects "
+    "ORDER BY updated_at DESC, id DESC LIMIT ?"
+)
+SQL_LIST_PROJECT_SUMMARIES_AFTER = (
+    f"SELECT {SQL_PROJECT_SUMMARY_COLUMNS} FROM projects "
+    "WHERE (updated_at, id) < (?, ?) ORDER BY updated_at DESC, id DESC LIMIT ?"
+)
+SQL_GET_PROJECT = f"{SQL_PROJECT_WITH_WORKSPACE} WHERE p.id = ?"
+SQL_DELETE_PROJECT = "DELETE FROM projects WHERE id = ?"
+SQL_DELETE_PROJECT_REVISIONS = "DELETE FROM project_revisions WHERE project_id = ?"
+SQL_INSERT_BLOB = "INSERT OR IGNORE INTO workspace_blobs (hash, codec, raw_size, data) VALUES (?, ?, ?, ?)"
+# Records the project's current revision; a no-op when the workspace was unchanged
+SQL_RECORD_REVISION = (
+    "INSERT OR IGNORE INTO project_revisions (project_id, revision, blob_hash, created_at) "
+    "SELECT id, revision, workspace_hash, updated_at FROM projects WHERE id = ?"
+)
+SQL_PRUNE_REVISIONS = (
+    "DELETE FROM project_revisions WHERE project_id = ? "
+    "AND revision <= (SELECT revision FROM projects WHERE id = ?) - ?"
+)
+# Blobs SQL_PRUNE_REVISIONS is about to release (same parameters)
+SQL_PRUNABLE_BLOBS = (
+    "SELECT DISTINCT blob_hash FROM project_revisions WHERE project_id = ? "
+    "AND revision <= (SELECT revision FROM projects WHERE id = ?) - ?"
+)
+# Blobs a project holds through its workspace or its revisions
+SQL_PROJECT_BLOBS = (
+    "SELECT blob_hash FROM project_revisions WHERE project_id = ? "
+    "UNION SELECT workspace_hash FROM projects WHERE id = ? AND workspace_hash IS NOT NULL"
+)
+SQL_DELETE_ORPHANED_BLOB = (
+    "DELETE FROM workspace_blobs WHERE hash = ? "
+    "AND NOT EXISTS (SELECT 1 FROM project_revisions WHERE blob_hash = ?) "
+    "AND NOT EXISTS (SELECT 1 FROM projects WHERE workspace_hash = ?)"
+)
+SQL_LIST_REVISIONS = (
+    "SELECT r.revision, r.created_at, r.blob_hash, b.raw_size FROM project_revisions r "
+    "JOIN workspace_blobs b ON b.hash = r.blob_hash WHERE r.project_id = ? ORDER BY r.revision DESC"
+)
+SQL_GET_REVISION = (
+    "SELECT r.revision, r.created_at, b.codec, b.data FROM project_revisions r "
+    "JOIN workspace_blobs b ON b.hash = r.blob_hash WHERE r.project_id = ? AND r.revision = ?"
+)
+PROJECT_UPDATE_FIELDS = ("name", "description", "workspace_hash", "xml_size", "block_count", "updated_at")
+# Fields whose change makes an update worth writing (updated_at alone is not)
+PROJECT_CHANGE_FIELDS = ("name", "description", "workspace_hash")
+
+# UPDATE ... RETURNING needs SQLite 3.35+; older builds re-select the row
+SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+SQL_PROJECT_RETURNING = "id, name, description, created_at, updated_at, revision, version"
+SQL_PROJECT_RETURNING_WITH_WORKSPACE = (
+    f"{SQL_PROJECT_RETURNING}, "
+    "(SELECT codec FROM workspace_blobs WHERE hash = projects.workspace_hash) AS codec, "
+    "(SELECT data FROM workspace_blobs WHERE hash = projects.workspace_hash) AS data"
+)
+
+def project_from_row(row, workspace_xml: Optional[str] = None) -> Dict[str, Any]:
+    """Build a Project dict, unpacking the workspace blob unless it is already known."""
+    project = dict(row)
+    codec, data = project.pop("codec", None), project.pop("data", None)
+    project.pop("workspace_hash", None)
+    project["workspace_xml"] = workspace_xml if workspace_xml is not None else unpack_workspace(codec, data)
+    return project
+
+def project_etag(version: int) -> str:
+    return f'"{version}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names `etag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Return the project version an If-Match header requires, if any."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match does not name a project version")
+
+# ─── Custom Block Storage ────────────────────────────────────────────────────
+
+CUSTOM_BLOCK_FIELDS = ("id", "name", "params", "body_code", "description", "color", "created_at")
+SQL_INSERT_CUSTOM_BLOCK = (
+    f"INSERT INTO custom_blocks ({', '.join(CUSTOM_BLOCK_FIELDS)}) "
+    f"VALUES ({', '.join('?' for _ in CUSTOM_BLOCK_FIELDS)})"
+)
+SQL_CUSTOM_BLOCK_COLUMNS = ", ".join(CUSTOM_BLOCK_FIELDS)
+# Oldest first, the order blocks were listed in when they lived in a JSON file
+SQL_LIST_CUSTOM_BLOCKS = f"SELECT {SQL_CUSTOM_BLOCK_COLUMNS} FROM custom_blocks ORDER BY created_at, id"
+SQL_LIST_CUSTOM_BLOCKS_PAGE = f"{SQL_LIST_CUSTOM_BLOCKS} LIMIT ?"
+SQL_LIST_CUSTOM_BLOCKS_AFTER = (
+    f"SELECT {SQL_CUSTOM_BLOCK_COLUMNS} FROM custom_blocks "
+    "WHERE (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT ?"
+)
+SQL_FIND_CUSTOM_BLOCKS_BY_NAME = (
+    f"SELECT {SQL_CUSTOM_BLOCK_COLUMNS} FROM custom_blocks WHERE name = ? ORDER BY created_at, id"
+)
+SQL_DELETE_CUSTOM_BLOCK = "DELETE FROM custom_blocks WHERE id = ?"
+
+def custom_block_from_row(row) -> Dict[str, Any]:
+    doc = dict(row)
+    doc["params"] = json.loads(doc["params"] or "[]")
+    return doc
+
+def custom_block_values(doc: Dict[str, Any]) -> tuple:
+    return tuple(json.dumps(doc.get(f, [])) if f == "params" else doc.get(f, "") for f in CUSTOM_BLOCK_FIELDS)
+
+async def migrate_custom_blocks_file(db: aiosqlite.Connection) -> bool:
+    """Import blocks from the old data/custom_blocks.json; returns whether it was read.
+
+    The caller sets the file aside once the import is committed. Inserts
+    skip ids already present, so an interrupted migration can simply rerun.
+    """
+    if not CUSTOM_BLOCKS_PATH.exists():
+        return False
+    try:
+        blocks = json.loads(CUSTOM_BLOCKS_PATH.read_text(encoding='utf-8'))
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not migrate {CUSTOM_BLOCKS_PATH}: {e}")
+        return False
+    rows = []
+    for block in blocks:
+        doc = {
+            "name": "",
+            "params": [],
+            "body_code": "",
+            "description": "",
+            "color": "#8b5cf6",
+            **block,
+        }
+        doc.setdefault("id", str(uuid.uuid4()))
+        doc.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        rows.append(custom_block_values(doc))
+    await db.executemany(SQL_INSERT_CUSTOM_BLOCK.replace("INSERT", "INSERT OR IGNORE", 1), rows)
+    logging.info(f"Moved {len(rows)} custom block(s) from {CUSTOM_BLOCKS_PATH.name} into the database")
+    return True
+
+class CustomBlockCache:
+    """Every custom block in memory, kept current by the write endpoints.
+
+    The full listing is served from here with an ETag, and each change is
+    pushed to the editors subscribed on /api/ws/custom-blocks. Writers hold
+    `changing()` across their database write and cache update, so a load
+    running concurrently can't miss a change.
+    """
+
+    # A subscriber this far behind gets a single "resync" instead of the backlog
+    MAX_PENDING_EVENTS = 256
+
+    def __init__(self):
+        self._blocks: Optional[Dict[str, dict]] = None
+        self._body: Optional[bytes] = None
+        self._epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self._subscribers: set = set()
+
+    @property
+    def etag(self) -> str:
+        return f'"{self._epoch}-{self._version}"'
 
-# ─── Custom Blocks JSON Storage ──────────────────────────────────────────────
+    def changing(self) -> asyncio.Lock:
+        return self._lock
 
-def load_custom_blocks() -> List[Dict[str, Any]]:
-    """Load custom blocks from JSON file."""
-    if CUSTOM_BLOCKS_PATH.exists():
-        with open(CUSTOM_BLOCKS_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+    async def _load(self) -> Dict[str, dict]:
+        if self._blocks is None:
+            async with self._lock:
+                if self._blocks is None:
+                    async with db_pool.read() as db:
+                        async with db.execute(SQL_LIST_CUSTOM_BLOCKS) as cur:
+                            blocks = [custom_block_from_row(row) for row in await cur.fetchall()]
+                    self._blocks = {b["id"]: b for b in blocks}
+        return self._blocks
 
-def save_custom_blocks(blocks: List[Dict[str, Any]]):
-    """Save custom blocks to JSON file."""
-    with open(CUSTOM_BLOCKS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(blocks, f, indent=2)
+    async def listing(self) -> bytes:
+        """The JSON body of the full listing, encoded once per change."""
+        blocks = await self._load()
+        if self._body is None:
+            self._body = json.dumps({"blocks": list(blocks.values())}).encode('utf-8')
+        return self._body
+
+    async def get(self, block_id: str) -> Optional[dict]:
+        return (await self._load()).get(block_id)
+
+    def added(self, block: dict):
+        if self._blocks is not None:
+            self._blocks[block["id"]] = block
+        self._changed({"type": "added", "block": block})
+
+    def deleted(self, block_id: str):
+        if self._blocks is not None:
+            self._blocks.pop(block_id, None)
+        self._changed({"type": "deleted", "id": block_id})
+
+    def _changed(self, event: dict):
+        self._body = None
+        self._version += 1
+        event["etag"] = self.etag
+        for queue in self._subscribers:
+            if queue.qsize() >= self.MAX_PENDING_EVENTS:
+                # Too far behind to catch up event by event: replace its backlog with one resync
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync", "etag": self.etag})
+            else:
+                queue.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+custom_block_cache = CustomBlockCache()
 
 # ─── Models ───────────────────────────────────────────────────────────────────
 
@@ -94,31 +658,77 @@ class Project(BaseModel):
     workspace_xml: str = ""
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    revision: int = 0
+    version: int = 1
+
+class ProjectSummary(BaseModel):
+    """Project listing entry without the workspace XML."""
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    name: str
+    description: str = ""
+    created_at: str
+    updated_at: str
+    xml_size: int = 0
+    block_count: int = 0
+
+class ProjectSummaryPage(BaseModel):
+    projects: List[ProjectSummary]
+    next_cursor: Optional[str] = None
 
 class ProjectCreate(BaseModel):
     name: str
     description: str = ""
 
+class WorkspaceEdit(BaseModel):
+    """Replace base[start:end] with text (UTF-16 code unit offsets)."""
+    start: int = Field(ge=0)
+    end: int = Field(ge=0)
+    text: str = ""
+
+class WorkspaceDelta(BaseModel):
+    base_revision: int
+    edits: List[WorkspaceEdit]
+
 class ProjectUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     workspace_xml: Optional[str] = None
+    workspace_delta: Optional[WorkspaceDelta] = None
+
+class ProjectRevision(BaseModel):
+    revision: int
+    created_at: str
+    hash: str
+    xml_size: int
 
 class ExecuteRequest(BaseModel):
     code: str
     project_id: Optional[str] = None
+    session_id: Optional[str] = None
+    run_id: Optional[str] = None
+
+class StopRequest(BaseModel):
+    run_id: Optional[str] = None
+    session_id: Optional[str] = None
 
 class ExecuteResponse(BaseModel):
+    run_id: Optional[str] = None
     stdout: str
     stderr: str
     exit_code: int
     execution_time: float
+    cpu_time: Optional[float] = None
+    peak_rss: Optional[int] = None
+    output_bytes: int = 0
+    truncated: bool = False
 
 class ScanRequest(BaseModel):
     package_name: str
 
 class ScanResponse(BaseModel):
     package_name: str
+    version: Optional[str] = None
     modules: List[Dict[str, Any]]
     block_definitions: List[Dict[str, Any]]
 
@@ -129,9 +739,12 @@ class SaveFileRequest(BaseModel):
 
 class ScanImportsRequest(BaseModel):
     code: str
+    session_id: Optional[str] = None
 
 class ScanImportsResponse(BaseModel):
     imports: List[Dict[str, Any]]
+    added: List[str] = []
+    removed: List[str] = []
 
 class CustomBlockDef(BaseModel):
     name: str
@@ -140,8 +753,484 @@ class CustomBlockDef(BaseModel):
     description: str = ""
     color: str = "#8b5cf6"
 
-# ─── Running processes tracker ────────────────────────────────────────────────
-running_processes: Dict[str, subprocess.Popen] = {}
+# ─── Run Registry ─────────────────────────────────────────────────────────────
+
+class RunRecord:
+    __slots__ = ("run_id", "session_id", "worker", "started_at", "stopped")
+
+    def __init__(self, run_id: str, session_id: str, worker: "ExecutionWorker"):
+        self.run_id = run_id
+        self.session_id = session_id
+        self.worker = worker
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.stopped = False
+
+class RunRegistry:
+    """Every live run, keyed by run_id, so runs can be listed and stopped."""
+
+    def __init__(self):
+        self._runs: Dict[str, RunRecord] = {}
+
+    @asynccontextmanager
+    async def track(self, run_id: str, session_id: str, worker: "ExecutionWorker"):
+        record = RunRecord(run_id, session_id, worker)
+        self._runs[run_id] = record
+        try:
+            yield record
+        finally:
+            self._runs.pop(run_id, None)
+
+    def list(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [
+            {"run_id": r.run_id, "session_id": r.session_id, "pid": r.worker.proc.pid, "started_at": r.started_at}
+            for r in self._runs.values()
+            if session_id is None or r.session_id == session_id
+        ]
+
+    def stop(self, run_id: Optional[str] = None, session_id: Optional[str] = None) -> List[str]:
+        """Kill the matching runs (all runs when no filter is given)."""
+        stopped = []
+        for record in list(self._runs.values()):
+            if run_id is not None and record.run_id != run_id:
+                continue
+            if session_id is not None and record.session_id != session_id:
+                continue
+            record.stopped = True
+            record.worker.kill()
+            stopped.append(record.run_id)
+        return stopped
+
+run_registry = RunRegistry()
+
+# ─── Warm Interpreter Pool ───────────────────────────────────────────────────
+
+class ExecutionWorker:
+    """An execution worker process plus the pipe it reports resource usage on.
+
+    Workers lead their own process group (a new process group on Windows), so
+    killing one takes down everything the program started.
+    """
+
+    def __init__(self, proc: asyncio.subprocess.Process, status_fd: Optional[int]):
+        self.proc = proc
+        self.status_fd = status_fd
+        self.usage: Optional[Dict[str, Any]] = None
+        # Measured just before we kill a running worker, which can't report then
+        self.killed_usage: Optional[Dict[str, Any]] = None
+
+    def kill(self):
+        """Kill the worker and every process it started."""
+        if self.proc.returncode is None and self.killed_usage is None and self.status_fd is not None:
+            self.killed_usage = process_usage(self.proc.pid)
+        if sys.platform == 'win32':
+            if self.proc.returncode is None:
+                subprocess.Popen(
+                    ['taskkill', '/F', '/T', '/PID', str(self.proc.pid)],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+                try:
+                    self.proc.kill()
+                except ProcessLookupError:
+                    pass
+            return
+        kill_process_group(self.proc.pid)
+
+    async def finish(self) -> Dict[str, Any]:
+        """Wait for the worker to exit, clean up its leftovers and return its usage."""
+        # Process.wait() also waits for the output pipes to close, which never
+        # happens while a background process the program started holds them,
+        # so watch the exit status as well.
+        waiter = asyncio.ensure_future(self.proc.wait())
+        while not waiter.done() and self.proc.returncode is None:
+            await asyncio.wait({waiter}, timeout=0.1)
+        if self.usage is None:
+            # Background processes the program left behind die with the run
+            self.kill()
+            self.usage = self.collect_usage()
+        await waiter
+        return self.usage
+
+    def collect_usage(self) -> Dict[str, Any]:
+        if self.status_fd is None:
+            return {}
+        try:
+            os.set_blocking(self.status_fd, False)
+            data = os.read(self.status_fd, 65536)
+        except OSError:
+            data = b""
+        finally:
+            os.close(self.status_fd)
+            self.status_fd = None
+        # A line when the program starts, another with its usage on exit
+        status = {}
+        for line in data.splitlines():
+            try:
+                status.update(json.loads(line))
+            except (ValueError, TypeError):
+                pass
+        baseline = status.pop("cpu_baseline", None)
+        cpu_limit = status.pop("cpu_limit", None)
+        if "cpu_time" in status or baseline is None:
+            return status
+        if self.killed_usage is not None:
+            return {
+                "cpu_time": round(max(0.0, self.killed_usage["cpu_time"] - baseline), 6),
+                "peak_rss": self.killed_usage["peak_rss"],
+            }
+        if cpu_limit is not None and self.proc.returncode == -signal.SIGKILL:
+            # The hard CPU limit struck before the worker could act on SIGXCPU
+            return {"cpu_time": round(max(0.0, cpu_limit - baseline), 6), "peak_rss": None}
+        return status
+
+def process_group_members(pgid: int) -> List[tuple]:
+    """Return (pid, ppid) of every process in a group (Linux only)."""
+    members = []
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return members
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[2]) == pgid:
+            members.append((int(entry), int(fields[1])))
+    return members
+
+def process_usage(pid: int) -> Optional[Dict[str, Any]]:
+    """CPU seconds (including reaped children) and peak RSS of a live process (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            fields = f.read().rsplit(b')', 1)[1].split()
+        with open(f'/proc/{pid}/status', 'rb') as f:
+            status = f.read().splitlines()
+    except OSError:
+        return None
+    # utime, stime, cutime and cstime, in clock ticks
+    cpu_time = sum(int(value) for value in fields[11:15]) / os.sysconf('SC_CLK_TCK')
+    peak_rss = None
+    for line in status:
+        if line.startswith(b'VmHWM:'):
+            peak_rss = int(line.split()[1]) * 1024
+    return {"cpu_time": cpu_time, "peak_rss": peak_rss}
+
+def reap_orphans(pids: List[int]):
+    """Collect exit statuses of killed processes that were re-parented to us."""
+    for pid in pids:
+        try:
+            os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            pass
+
+def kill_process_group(pgid: int):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        return
+    except PermissionError:
+        return
+    # When the server runs as PID 1 (e.g. in a container), orphaned processes
+    # of the run become our children and would linger as zombies.
+    me = os.getpid()
+    orphans = [pid for pid, ppid in process_group_members(pgid) if ppid == me and pid != pgid]
+    if orphans:
+        asyncio.get_running_loop().call_later(0.5, reap_orphans, orphans)
+
+def compile_program(code: str) -> Optional[bytes]:
+    """Marshalled code object for `code`, or None when the worker should compile it and report the error."""
+    try:
+        return marshal.dumps(compile(code, EXEC_PROGRAM_FILENAME, 'exec', dont_inherit=True))
+    except (SyntaxError, ValueError, RecursionError, MemoryError, OverflowError):
+        return None
+
+class BytecodeCache:
+    """Compiled programs by source hash, so reruns skip compilation.
+
+    Workers run the same interpreter as the server, so marshalled code
+    objects compiled here load there as-is. Nothing is compiled on the
+    way to a run: a miss sends the source alone, which the worker compiles
+    under the run's limits, and the program is compiled afterwards in a
+    thread, one at a time and only up to EXEC_BYTECODE_MAX_SOURCE bytes,
+    for the next run of the same source. Sources that don't compile are
+    remembered as None and left to the worker, which reports the error.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(0, size)
+        self._entries: "OrderedDict[str, Optional[bytes]]" = OrderedDict()
+        self._compiling = None
+
+    def get(self, code: str, payload: bytes) -> Optional[bytes]:
+        if not self.size or len(payload) > EXEC_BYTECODE_MAX_SOURCE:
+            return None
+        key = hashlib.sha256(payload).hexdigest()
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        # Misses while another program is compiling just aren't cached
+        if self._compiling is None:
+            self._compiling = asyncio.create_task(self._compile(key, code))
+        return None
+
+    async def _compile(self, key: str, code: str):
+        try:
+            bytecode = await asyncio.to_thread(compile_program, code)
+        finally:
+            self._compiling = None
+        self._entries[key] = bytecode
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+bytecode_cache = BytecodeCache(EXEC_BYTECODE_CACHE_SIZE)
+
+class InterpreterPool:
+    """Interpreters started and warmed ahead of time for code execution.
+
+    Each worker (backend/exec_worker.py) runs exactly one program and exits,
+    so runs never share interpreter state; a replacement is started in the
+    background as soon as a worker is handed out.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(0, size)
+        self._idle: Optional[asyncio.Queue] = None
+        self._pending: set = set()
+        self._closed = False
+
+    async def _spawn(self) -> ExecutionWorker:
+        args = [sys.executable, '-u', str(EXEC_WORKER_PATH)]
+        kwargs = {}
+        status_read = status_write = None
+        if sys.platform == 'win32':
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs['start_new_session'] = True
+            status_read, status_write = os.pipe()
+            args += ['--status-fd', str(status_write)]
+            kwargs['pass_fds'] = (status_write,)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=EXEC_WORKDIR,
+                **kwargs
+            )
+        except BaseException:
+            if status_read is not None:
+                os.close(status_read)
+            raise
+        finally:
+            if status_write is not None:
+                os.close(status_write)
+        return ExecutionWorker(proc, status_read)
+
+    async def _add_worker(self):
+        try:
+            worker = await self._spawn()
+        except Exception as e:
+            logging.warning(f"Could not start execution worker: {e}")
+            return
+        if self._closed:
+            worker.kill()
+            await worker.finish()
+            return
+        self._idle.put_nowait(worker)
+
+    def _refill(self):
+        task = asyncio.create_task(self._add_worker())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def start(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._refill()
+
+    async def close(self):
+        self._closed = True
+        for task in list(self._pending):
+            task.cancel()
+        while self._idle is not None and not self._idle.empty():
+            worker = self._idle.get_nowait()
+            worker.kill()
+            await worker.finish()
+
+    async def _acquire(self) -> ExecutionWorker:
+        """Hand out a warm worker, or start one cold if none is ready."""
+        while self._idle is not None and not self._idle.empty():
+            worker = self._idle.get_nowait()
+            self._refill()
+            if worker.proc.returncode is None:
+                return worker
+            worker.collect_usage()
+        return await self._spawn()
+
+    async def run(self, code: str) -> ExecutionWorker:
+        """Start running `code` and return its worker; the caller reads its output."""
+        payload = code.encode('utf-8')
+        bytecode = bytecode_cache.get(code, payload)
+        header = {"size": len(payload), "limits": EXEC_RLIMITS}
+        if bytecode is not None:
+            header["bytecode_size"] = len(bytecode)
+            payload += bytecode
+        job = json.dumps(header).encode('utf-8') + b"\n" + payload
+        for attempt in range(2):
+            worker = await self._acquire()
+            try:
+                worker.proc.stdin.write(job)
+                await worker.proc.stdin.drain()
+                worker.proc.stdin.close()
+                return worker
+            except (BrokenPipeError, ConnectionResetError):
+                # Worker died while idle; retry once with a fresh one
+                worker.collect_usage()
+                if attempt:
+                    raise
+        raise RuntimeError("unreachable")
+
+def describe_exit(exit_code: int) -> Optional[str]:
+    """Explain exits caused by the run limits, for appending to stderr."""
+    if sys.platform != 'win32' and EXEC_RLIMITS.get("cpu_seconds") and exit_code in (-signal.SIGXCPU, -signal.SIGKILL):
+        return f"CPU time limit exceeded ({EXEC_RLIMITS['cpu_seconds']}s)"
+    return None
+
+async def gather_or_cancel(*aws):
+    """asyncio.gather, except that when one fails the rest are cancelled and awaited before the error propagates."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+async def read_capped(stream: asyncio.StreamReader, limit: int, on_overflow) -> tuple:
+    """Read a stream to EOF keeping at most `limit` bytes; returns (data, truncated)."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return b"".join(chunks), False
+        if limit and size + len(chunk) > limit:
+            chunks.append(chunk[:limit - size])
+            on_overflow()
+            return b"".join(chunks), True
+        chunks.append(chunk)
+        size += len(chunk)
+
+exec_pool = InterpreterPool(EXEC_POOL_SIZE)
+
+# ─── Execution Scheduler ─────────────────────────────────────────────────────
+
+class SchedulerFull(Exception):
+    """Raised when the execution queue cannot take another run."""
+
+class _QueuedRun:
+    __slots__ = ("future", "on_position", "position")
+
+    def __init__(self, future: asyncio.Future, on_position):
+        self.future = future
+        self.on_position = on_position
+        self.position = 0
+
+class ExecutionScheduler:
+    """Bounds concurrent runs and shares free slots fairly between clients.
+
+    Waiting runs are kept in one FIFO per client and slots are handed out
+    round-robin across clients, so a client queuing many runs cannot starve
+    the others. When the queue is full, `slot()` raises SchedulerFull instead
+    of letting work pile up.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, max_queued_per_client: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self.running = 0
+        self.queued = 0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+
+    @asynccontextmanager
+    async def slot(self, client_id: str, on_position=None):
+        """Hold a run slot for the block, waiting in the client's queue if needed.
+
+        `on_position(n)` is called with the 1-based queue position whenever it
+        changes while waiting.
+        """
+        await self._acquire(client_id, on_position)
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._dispatch()
+
+    async def _acquire(self, client_id: str, on_position):
+        if self.running < self.max_concurrent and not self.queued:
+            self.running += 1
+            return
+        queue = self._queues.get(client_id)
+        if self.queued >= self.max_queued or (queue and len(queue) >= self.max_queued_per_client):
+            raise SchedulerFull()
+        entry = _QueuedRun(asyncio.get_running_loop().create_future(), on_position)
+        self._queues.setdefault(client_id, deque()).append(entry)
+        self.queued += 1
+        self._notify_positions()
+        try:
+            await entry.future
+        except asyncio.CancelledError:
+            if entry.future.done() and not entry.future.cancelled():
+                # Slot was granted just as we were cancelled: hand it on
+                self.running -= 1
+                self._dispatch()
+            else:
+                self._remove(client_id, entry)
+            raise
+
+    def _remove(self, client_id: str, entry: _QueuedRun):
+        queue = self._queues.get(client_id)
+        if queue and entry in queue:
+            queue.remove(entry)
+            self.queued -= 1
+            if not queue:
+                del self._queues[client_id]
+            self._notify_positions()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent and self._queues:
+            client_id, queue = next(iter(self._queues.items()))
+            entry = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            if entry.future.done():
+                continue
+            self.running += 1
+            entry.future.set_result(None)
+        self._notify_positions()
+
+    def _notify_positions(self):
+        # Round r serves the r-th waiting run of every client, in client order
+        queues = list(self._queues.values())
+        for k, queue in enumerate(queues):
+            for i, entry in enumerate(queue):
+                ahead = sum(min(len(q), i) for q in queues)
+                ahead += sum(1 for q in queues[:k] if len(q) > i)
+                if entry.position != ahead + 1:
+                    entry.position = ahead + 1
+                    if entry.on_position:
+                        entry.on_position(entry.position)
+
+exec_scheduler = ExecutionScheduler(EXEC_MAX_CONCURRENT, EXEC_MAX_QUEUED, EXEC_MAX_QUEUED_PER_CLIENT)
 
 # ─── Health ───────────────────────────────────────────────────────────────────
 
@@ -154,391 +1243,1450 @@ async def root():
 @api_router.post("/projects", response_model=Project)
 async def create_project(data: ProjectCreate):
     project = Project(name=data.name, description=data.description)
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with db_pool.write() as db:
         await db.execute(
-            "INSERT INTO projects (id, name, description, workspace_xml, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
-            (project.id, project.name, project.description, project.workspace_xml, project.created_at, project.updated_at)
+            SQL_INSERT_PROJECT,
+            (project.id, project.name, project.description, project.created_at, project.updated_at)
         )
-        await db.commit()
     return project
 
 @api_router.get("/projects", response_model=List[Project])
 async def list_projects():
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM projects ORDER BY updated_at DESC") as cursor:
+    async with db_pool.read() as db:
+        async with db.execute(SQL_LIST_PROJECTS) as cursor:
             rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+            return [project_from_row(row) for row in rows]
+
+def encode_keyset_cursor(sort_key: str, row_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{sort_key}|{row_id}".encode("utf-8")).decode("ascii")
+
+def decode_keyset_cursor(cursor: str) -> tuple:
+    try:
+        sort_key, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_key, row_id
+
+@api_router.get("/projects/summary", response_model=ProjectSummaryPage)
+async def list_project_summaries(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    """List projects newest first without their workspace XML.
+
+    Pages are keyset-paginated on (updated_at, id): pass the returned
+    ``next_cursor`` to fetch the following page.
+    """
+    if cursor:
+        params = (*decode_keyset_cursor(cursor), limit + 1)
+        sql = SQL_LIST_PROJECT_SUMMARIES_AFTER
+    else:
+        params = (limit + 1,)
+        sql = SQL_LIST_PROJECT_SUMMARIES
+    async with db_pool.read() as db:
+        async with db.execute(sql, params) as cur:
+            rows = [dict(row) for row in await cur.fetchall()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_keyset_cursor(rows[-1]["updated_at"], rows[-1]["id"])
+    return ProjectSummaryPage(projects=rows, next_cursor=next_cursor)
 
 @api_router.get("/projects/{project_id}", response_model=Project)
-async def get_project(project_id: str):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM projects WHERE id = ?", (project_id,)) as cursor:
+async def get_project(project_id: str, response: Response):
+    async with db_pool.read() as db:
+        async with db.execute(SQL_GET_PROJECT, (project_id,)) as cursor:
             row = await cursor.fetchone()
             if not row:
                 raise HTTPException(status_code=404, detail="Project not found")
-            return dict(row)
+            response.headers["ETag"] = project_etag(row["version"])
+            return project_from_row(row)
+
+async def load_workspace_revision(project_id: str, revision: int) -> str:
+    """Return the workspace XML saved as the given revision of a project."""
+    if revision == 0:
+        return ""
+    async with db_pool.read() as db:
+        async with db.execute(SQL_GET_REVISION, (project_id, revision)) as cursor:
+            row = await cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=409, detail="Base revision is no longer available")
+    return unpack_workspace(row["codec"], row["data"])
 
 @api_router.put("/projects/{project_id}", response_model=Project)
-async def update_project(project_id: str, data: ProjectUpdate):
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+async def update_project(
+    project_id: str,
+    data: ProjectUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+):
+    """Update a project's metadata and/or workspace.
+
+    The workspace can be sent whole as ``workspace_xml`` or as a
+    ``workspace_delta`` against ``base_revision``; a delta against a revision
+    that is no longer current is rejected with 409 so the client can resend
+    the full XML. An ``If-Match`` header carrying the project's ETag makes the
+    write conditional on nobody else having saved in between (412 otherwise).
+
+    The row is updated and returned by a single ``UPDATE ... RETURNING``.
+    Payloads that change nothing (same name, description and XML hash) match
+    no row, so nothing is written.
+    """
+    if data.workspace_xml is not None and data.workspace_delta is not None:
+        raise HTTPException(status_code=400, detail="Send either workspace_xml or workspace_delta, not both")
+    expected_version = parse_if_match(if_match)
+    update_data = {k: v for k, v in data.model_dump(include={"name", "description"}).items() if v is not None}
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
-    set_clause = ", ".join(f"{k} = ?" for k in update_data.keys())
-    values = list(update_data.values()) + [project_id]
+    workspace_xml = data.workspace_xml
+    base_revision = None
+    if data.workspace_delta is not None:
+        base_revision = data.workspace_delta.base_revision
+        base = await load_workspace_revision(project_id, base_revision)
+        workspace_xml = apply_workspace_delta(base, data.workspace_delta.edits)
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(f"UPDATE projects SET {set_clause} WHERE id = ?", values)
-        await db.commit()
-        
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM projects WHERE id = ?", (project_id,)) as cursor:
+    blob = None
+    if workspace_xml is not None:
+        # Hash and compress off the event loop, before taking the write lock
+        blob = await asyncio.to_thread(pack_workspace, workspace_xml)
+        update_data["workspace_hash"] = blob.hash
+        update_data["xml_size"] = blob.raw_size
+        update_data["block_count"] = blob.block_count
+    
+    # Fixed column order keeps the number of distinct statements small
+    columns = [k for k in PROJECT_UPDATE_FIELDS if k in update_data]
+    set_clause = ", ".join(f"{k} = ?" for k in columns) + ", version = version + 1"
+    values = [update_data[k] for k in columns]
+    if blob is not None:
+        # SET expressions see the old row, so the revision only advances on change
+        set_clause += ", revision = revision + (workspace_hash IS NOT ?)"
+        values.append(blob.hash)
+    
+    conditions = ["id = ?"]
+    values.append(project_id)
+    if expected_version is not None:
+        conditions.append("version = ?")
+        values.append(expected_version)
+    if base_revision is not None:
+        conditions.append("revision = ?")
+        values.append(base_revision)
+    changed = [k for k in PROJECT_CHANGE_FIELDS if k in update_data]
+    row = None
+    if changed:
+        conditions.append("(" + " OR ".join(f"{k} IS NOT ?" for k in changed) + ")")
+        values.extend(update_data[k] for k in changed)
+        update_sql = f"UPDATE projects SET {set_clause} WHERE {' AND '.join(conditions)}"
+        returning = SQL_PROJECT_RETURNING if workspace_xml is not None else SQL_PROJECT_RETURNING_WITH_WORKSPACE
+        async with db_pool.write() as db:
+            if SQLITE_HAS_RETURNING:
+                async with db.execute(f"{update_sql} RETURNING {returning}", values) as cursor:
+                    row = await cursor.fetchone()
+            else:
+                cursor = await db.execute(update_sql, values)
+                if cursor.rowcount:
+                    async with db.execute(f"SELECT {returning} FROM projects WHERE id = ?", (project_id,)) as cursor:
+                        row = await cursor.fetchone()
+            if row is not None and blob is not None:
+                # No-op when this content is already stored
+                await db.execute(SQL_INSERT_BLOB, (blob.hash, blob.codec, blob.raw_size, blob.data))
+                await db.execute(SQL_RECORD_REVISION, (project_id,))
+                prune_args = (project_id, project_id, WORKSPACE_HISTORY_LIMIT)
+                released = await fetch_column(db, SQL_PRUNABLE_BLOBS, prune_args)
+                await db.execute(SQL_PRUNE_REVISIONS, prune_args)
+                await delete_orphaned_blobs(db, released)
+    
+    if row is None:
+        # No row written: missing project, failed precondition, or an unchanged payload
+        async with db_pool.read() as db:
+            async with db.execute(SQL_GET_PROJECT, (project_id,)) as cursor:
+                row = await cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Project not found")
+        if expected_version is not None and row["version"] != expected_version:
+            raise HTTPException(status_code=412, detail="Project was modified since it was loaded")
+        if base_revision is not None and row["revision"] != base_revision:
+            raise HTTPException(status_code=409, detail="Project was saved elsewhere; resend the full workspace")
+    
+    response.headers["ETag"] = project_etag(row["version"])
+    return project_from_row(row, workspace_xml)
+
+@api_router.get("/projects/{project_id}/revisions", response_model=List[ProjectRevision])
+async def list_project_revisions(project_id: str):
+    """List the saved workspace revisions of a project, newest first."""
+    async with db_pool.read() as db:
+        async with db.execute(SQL_LIST_REVISIONS, (project_id,)) as cursor:
+            rows = await cursor.fetchall()
+    return [
+        ProjectRevision(revision=row["revision"], created_at=row["created_at"], hash=row["blob_hash"], xml_size=row["raw_size"])
+        for row in rows
+    ]
+
+@api_router.get("/projects/{project_id}/revisions/{revision}")
+async def get_project_revision(project_id: str, revision: int):
+    async with db_pool.read() as db:
+        async with db.execute(SQL_GET_REVISION, (project_id, revision)) as cursor:
             row = await cursor.fetchone()
-            if not row:
-                raise HTTPException(status_code=404, detail="Project not found")
-            return dict(row)
+    if not row:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {
+        "revision": row["revision"],
+        "created_at": row["created_at"],
+        "workspace_xml": unpack_workspace(row["codec"], row["data"]),
+    }
 
 @api_router.delete("/projects/{project_id}")
 async def delete_project(project_id: str):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("DELETE FROM projects WHERE id = ?", (project_id,))
-        await db.commit()
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Project not found")
+    async with db_pool.write() as db:
+        released = await fetch_column(db, SQL_PROJECT_BLOBS, (project_id, project_id))
+        cursor = await db.execute(SQL_DELETE_PROJECT, (project_id,))
+        deleted = cursor.rowcount
+        await db.execute(SQL_DELETE_PROJECT_REVISIONS, (project_id,))
+        await delete_orphaned_blobs(db, released)
+    if deleted == 0:
+        raise HTTPException(status_code=404, detail="Project not found")
     return {"status": "deleted"}
 
 # ─── Code Execution ──────────────────────────────────────────────────────────
 
 @api_router.post("/execute", response_model=ExecuteResponse)
-async def execute_code(req: ExecuteRequest):
-    import time
-    start = time.time()
-    
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, dir='/tmp') as f:
-        f.write(req.code)
-        tmp_path = f.name
+async def execute_code(req: ExecuteRequest, request: Request):
+    client_id = req.session_id or (request.client.host if request.client else "anonymous")
+    run_id = req.run_id or str(uuid.uuid4())
     
     try:
-        proc = await asyncio.create_subprocess_exec(
-            sys.executable, tmp_path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd='/tmp'
+        async with exec_scheduler.slot(client_id):
+            start = time.time()
+            worker = await exec_pool.run(req.code)
+            async with run_registry.track(run_id, client_id, worker) as record:
+                try:
+                    (stdout, out_truncated), (stderr, err_truncated), usage = await asyncio.wait_for(
+                        gather_or_cancel(
+                            read_capped(worker.proc.stdout, EXEC_MAX_OUTPUT_BYTES, worker.kill),
+                            read_capped(worker.proc.stderr, EXEC_MAX_OUTPUT_BYTES, worker.kill),
+                            worker.finish()
+                        ),
+                        timeout=EXEC_TIMEOUT or None
+                    )
+                except asyncio.TimeoutError:
+                    worker.kill()
+                    usage = await worker.finish()
+                    return ExecuteResponse(
+                        run_id=run_id,
+                        stdout="", stderr=f"Execution timed out ({EXEC_TIMEOUT:g}s limit)", exit_code=-1,
+                        execution_time=time.time() - start,
+                        cpu_time=usage.get("cpu_time"), peak_rss=usage.get("peak_rss")
+                    )
+    except SchedulerFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many runs queued, try again shortly",
+            headers={"Retry-After": "1"}
         )
+    
+    exit_code = worker.proc.returncode or 0
+    truncated = out_truncated or err_truncated
+    stderr_text = stderr.decode('utf-8', errors='replace')
+    if record.stopped:
+        stderr_text += "\n[Execution stopped]\n"
+    elif truncated:
+        stderr_text += f"\n[Output truncated at {EXEC_MAX_OUTPUT_BYTES} bytes; program stopped]\n"
+    elif describe_exit(exit_code):
+        stderr_text += f"\n{describe_exit(exit_code)}\n"
+    
+    return ExecuteResponse(
+        run_id=run_id,
+        stdout=stdout.decode('utf-8', errors='replace'),
+        stderr=stderr_text,
+        exit_code=exit_code,
+        execution_time=time.time() - start,
+        cpu_time=usage.get("cpu_time"),
+        peak_rss=usage.get("peak_rss"),
+        output_bytes=len(stdout) + len(stderr),
+        truncated=truncated
+    )
+
+@api_router.get("/execute/runs")
+async def list_runs(session_id: Optional[str] = None):
+    """List live runs, optionally only those of one session."""
+    return {"runs": run_registry.list(session_id)}
+
+@api_router.post("/execute/stop")
+async def stop_execution(req: Optional[StopRequest] = None):
+    """Stop one run, every run of a session, or (with no body) every run."""
+    req = req or StopRequest()
+    stopped = run_registry.stop(run_id=req.run_id, session_id=req.session_id)
+    return {"status": "stopped", "stopped": stopped}
+
+# ─── Package Scanner ──────────────────────────────────────────────────────────
+
+class IntrospectionFailed(Exception):
+    """The introspection worker crashed, timed out or produced no result."""
+
+class IntrospectionTimedOut(IntrospectionFailed):
+    """The introspection worker ran past SCAN_TIMEOUT, which may not happen again."""
+
+def module_fingerprint(module_name: str) -> Optional[str]:
+    """Identify the installed copy of a module without importing it; None if it isn't installed."""
+    import importlib.util
+    try:
+        spec = importlib.util.find_spec(module_name.split('.')[0])
+    except (ImportError, ValueError):
+        return None
+    if spec is None:
+        return None
+    # Reinstalling or upgrading rewrites these, which changes their stat
+    paths = list(spec.submodule_search_locations or [])
+    if spec.has_location and spec.origin:
+        paths.append(spec.origin)
+    parts = [sys.version, spec.origin or '']
+    for path in paths:
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=30)
-        except asyncio.TimeoutError:
-            proc.kill()
-            await proc.communicate()
-            return ExecuteResponse(
-                stdout="", stderr="Execution timed out (30s limit)", exit_code=-1,
-                execution_time=time.time() - start
+            st = os.stat(path)
+        except OSError:
+            continue
+        parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+    return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()
+
+class PackageIntrospector:
+    """Runs backend/introspect_worker.py and caches what it reports.
+
+    Results are kept in memory and under data/scan_cache, stored with the
+    module's fingerprint so they go stale when the installed package changes.
+    Concurrent requests for the same module share one worker, and at most
+    SCAN_MAX_CONCURRENT workers run at a time. Failed imports and crashed
+    workers (but not timeouts) are only remembered in memory, until the
+    module's fingerprint changes or pip installs something.
+    prune() clears out results for packages that have since changed or gone
+    and keeps the directory under max_bytes.
+    """
+
+    def __init__(self, cache_dir: Path, max_concurrent: int, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._memory: Dict[tuple, tuple] = {}
+        self._failures: Dict[tuple, tuple] = {}
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(max(1, max_concurrent))
+
+    def _cache_path(self, key: tuple) -> Path:
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', "-".join(key))
+        if len(name) > 120:
+            name = f"{name[:80]}-{hashlib.sha256(name.encode('utf-8')).hexdigest()[:16]}"
+        return self.cache_dir / f"{name}.json"
+
+    def _read_disk(self, key: tuple, fingerprint: str) -> Optional[dict]:
+        try:
+            stored = json.loads(self._cache_path(key).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if stored.get("fingerprint") != fingerprint:
+            return None
+        return stored.get("result")
+
+    def _write_disk(self, key: tuple, fingerprint: str, result: dict):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._cache_path(key)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            stored = {"key": list(key), "fingerprint": fingerprint, "result": result}
+            tmp.write_text(json.dumps(stored), encoding='utf-8')
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.warning(f"Could not cache {' '.join(key)}: {e}")
+            tmp.unlink(missing_ok=True)
+
+    def failed(self, command: str, module_name: str, fingerprint: str, *args: str) -> bool:
+        """Whether the module, as installed with this fingerprint, already failed to load."""
+        key = (command, module_name, *args)
+        cached = self._memory.get(key)
+        if cached is not None and cached[0] == fingerprint and "error" in cached[1]:
+            return True
+        failure = self._failures.get(key)
+        return failure is not None and failure[0] == fingerprint
+
+    def forget_failures(self):
+        """Retry failed modules, e.g. after installing what they were missing."""
+        self._failures.clear()
+        for key in [key for key, (_, result) in self._memory.items() if "error" in result]:
+            del self._memory[key]
+
+    def prune(self):
+        """Delete stale and leftover cache files, then the oldest ones beyond max_bytes."""
+        try:
+            paths = list(self.cache_dir.iterdir())
+        except OSError:
+            return
+        fingerprints: Dict[str, Optional[str]] = {}
+        kept = []
+        stale = []
+        for path in paths:
+            # Temporary files of interrupted writes are stale too
+            if path.name.startswith('.'):
+                stale.append(path)
+                continue
+            try:
+                st = path.stat()
+                stored = json.loads(path.read_text(encoding='utf-8'))
+                module_name = stored["key"][1]
+            except OSError:
+                continue
+            except (ValueError, KeyError, IndexError, TypeError):
+                stale.append(path)
+                continue
+            if module_name not in fingerprints:
+                fingerprints[module_name] = module_fingerprint(module_name)
+            if stored.get("fingerprint") != fingerprints[module_name]:
+                stale.append(path)
+            else:
+                kept.append((st.st_mtime, st.st_size, path))
+        total = 0
+        for _, size, path in sorted(kept, key=lambda entry: entry[0], reverse=True):
+            total += size
+            if total > self.max_bytes:
+                stale.append(path)
+        for path in stale:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    async def _run_worker(self, key: tuple) -> dict:
+        async with self._slots:
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, str(INTROSPECT_WORKER_PATH), *key,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=EXEC_WORKDIR
             )
-        
-        return ExecuteResponse(
-            stdout=stdout.decode('utf-8', errors='replace'),
-            stderr=stderr.decode('utf-8', errors='replace'),
-            exit_code=proc.returncode or 0,
-            execution_time=time.time() - start
-        )
-    finally:
-        os.unlink(tmp_path)
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=SCAN_TIMEOUT)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise IntrospectionTimedOut(f"timed out after {SCAN_TIMEOUT:g}s")
+        if proc.returncode != 0:
+            lines = stderr.decode('utf-8', errors='replace').strip().splitlines()
+            raise IntrospectionFailed(lines[-1] if lines else f"exit code {proc.returncode}")
+        try:
+            return json.loads(stdout)
+        except ValueError:
+            raise IntrospectionFailed("worker produced no result")
 
-@api_router.post("/execute/stop")
-async def stop_execution():
-    for pid, proc in list(running_processes.items()):
+    async def introspect(self, command: str, module_name: str, *args: str) -> dict:
+        """Return the worker's result for a module, from cache when it is still current."""
+        fingerprint = await asyncio.to_thread(module_fingerprint, module_name)
+        if fingerprint is None:
+            return {"error": "not_found", "detail": f"No module named '{module_name}'"}
+
+        key = (command, module_name, *args)
+        cached = self._memory.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        failure = self._failures.get(key)
+        if failure is not None and failure[0] == fingerprint:
+            raise IntrospectionFailed(failure[1])
+
+        # Callers share one load, which outlives any of them being cancelled
+        flight_key = (key, fingerprint)
+        task = self._inflight.get(flight_key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, fingerprint))
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(flight_key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: tuple, fingerprint: str) -> dict:
+        result = await asyncio.to_thread(self._read_disk, key, fingerprint)
+        if result is None:
+            try:
+                result = await self._run_worker(key)
+            except IntrospectionTimedOut:
+                raise
+            except IntrospectionFailed as e:
+                self._failures[key] = (fingerprint, str(e))
+                raise
+            if "error" not in result:
+                await asyncio.to_thread(self._write_disk, key, fingerprint, result)
+        self._memory[key] = (fingerprint, result)
+        return result
+
+introspector = PackageIntrospector(SCAN_CACHE_DIR, SCAN_MAX_CONCURRENT, SCAN_CACHE_MAX_BYTES)
+
+class BlockBundles:
+    """Bundles written by build_block_bundles.py, served as stored and used to answer scans.
+
+    index.json is re-read whenever its mtime changes, so rebuilding the
+    bundles takes effect without a restart.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._bundles: Dict[str, dict] = {}
+        self._index_mtime: Optional[int] = None
+        self._files: Dict[str, bytes] = {}
+        self._decoded: Dict[str, dict] = {}
+
+    def _load_index(self) -> Dict[str, dict]:
+        path = self.directory / 'index.json'
         try:
-            proc.kill()
-        except Exception:
-            pass
-    running_processes.clear()
-    return {"status": "stopped"}
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._index_mtime:
+            try:
+                self._bundles = json.loads(path.read_text(encoding='utf-8')).get("bundles", {})
+            except (OSError, ValueError):
+                self._bundles = {}
+            self._index_mtime = mtime
+            self._files.clear()
+            self._decoded.clear()
+        return self._bundles
 
-# ─── Package Scanner ──────────────────────────────────────────────────────────
+    async def index(self) -> Dict[str, dict]:
+        return await asyncio.to_thread(self._load_index)
+
+    async def data(self, module_name: str) -> Optional[tuple]:
+        """Return (index entry, gzip bytes) for a module's bundle, if one was built."""
+        entry = (await self.index()).get(module_name)
+        if entry is None:
+            return None
+        data = self._files.get(entry["etag"])
+        if data is None:
+            try:
+                data = await asyncio.to_thread((self.directory / Path(entry["file"]).name).read_bytes)
+            except OSError:
+                return None
+            self._files[entry["etag"]] = data
+        return entry, data
+
+    async def current(self, module_name: str) -> Optional[dict]:
+        """The decoded bundle for a module, if it was built for the installed version."""
+        found = await self.data(module_name)
+        if found is None:
+            return None
+        entry, data = found
+        if entry["version"] != await installed_module_version(module_name):
+            return None
+        if entry["etag"] not in self._decoded:
+            self._decoded[entry["etag"]] = json.loads(gzip.decompress(data))
+        return self._decoded[entry["etag"]]
+
+block_bundles = BlockBundles(BLOCK_BUNDLES_DIR)
+
+async def installed_module_version(module_name: str) -> Optional[str]:
+    """Version a module is installed at, from metadata alone (stdlib modules report PYTHON_TAG)."""
+    top_level = module_name.split('.')[0]
+    if top_level in STDLIB_MODULES:
+        return PYTHON_TAG
+    entry = await package_index.for_module(top_level)
+    return entry["version"] if entry else None
 
 @api_router.post("/scanner/scan", response_model=ScanResponse)
 async def scan_package(req: ScanRequest):
     """Scan a Python package and generate block definitions."""
-    import importlib
-    import inspect
-    
+    bundle = await block_bundles.current(req.package_name)
+    if bundle is not None:
+        return ScanResponse(**bundle)
     try:
-        mod = importlib.import_module(req.package_name)
-    except ImportError:
+        result = await introspector.introspect("scan", req.package_name)
+    except IntrospectionFailed as e:
+        raise HTTPException(status_code=500, detail=f"Scanning '{req.package_name}' failed: {e}")
+    if result.get("error") == "not_found":
         raise HTTPException(status_code=404, detail=f"Package '{req.package_name}' not found")
-    
-    modules = []
-    block_defs = []
-    
-    for name, obj in inspect.getmembers(mod):
-        if name.startswith('_'):
-            continue
-        
-        entry = {"name": name, "type": type(obj).__name__}
-        
-        if inspect.isfunction(obj) or inspect.isbuiltin(obj):
-            entry["type"] = "function"
+    return ScanResponse(**result)
+
+@api_router.get("/scanner/bundles")
+async def list_block_bundles(request: Request):
+    """List prebuilt block bundles with versioned URLs (revalidated by ETag)."""
+    bundles = {
+        name: {
+            "version": entry["version"],
+            "blocks": entry.get("blocks"),
+            "size": entry.get("size"),
+            "etag": entry["etag"],
+            "url": f"/api/scanner/bundles/{name}?v={entry['etag']}"
+        }
+        for name, entry in sorted((await block_bundles.index()).items())
+    }
+    body = json.dumps({"bundles": bundles}).encode('utf-8')
+    headers = {"ETag": f'"{hashlib.sha256(body).hexdigest()[:32]}"', "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/scanner/bundles/{module_name}")
+async def get_block_bundle(module_name: str, request: Request, v: Optional[str] = None):
+    """Serve a prebuilt bundle as stored (gzip), or decompressed for clients that don't accept it."""
+    found = await block_bundles.data(module_name)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"No block bundle for '{module_name}'")
+    entry, data = found
+    compressed = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        # The gzip and identity bodies differ, so each gets its own strong ETag
+        "ETag": f'"{entry["etag"]}-gz"' if compressed else f'"{entry["etag"]}"',
+        # URLs from the index carry the ETag, so their content never changes
+        "Cache-Control": "public, max-age=31536000, immutable" if v == entry["etag"] else "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=data, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(data), media_type="application/json", headers=headers)
+
+async def introspect_or_404(command: str, module_name: str, *args: str) -> dict:
+    try:
+        result = await introspector.introspect(command, module_name, *args)
+    except IntrospectionFailed as e:
+        raise HTTPException(status_code=500, detail=f"Inspecting '{module_name}' failed: {e}")
+    if result.get("error") == "not_found":
+        raise HTTPException(status_code=404, detail=result.get("detail") or f"Module '{module_name}' not found")
+    return result
+
+@api_router.get("/scanner/members/{module_name}")
+async def list_module_members(
+    module_name: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Page through every public member of a module by name.
+
+    Only names and kinds are listed (lazily provided attributes show as
+    "lazy" and aren't loaded); signatures come from the signature endpoint.
+    Pass the returned next_cursor to get the following page.
+    """
+    import bisect
+    result = await introspect_or_404("members", module_name)
+    members = result["members"]
+    start = bisect.bisect_right([m["name"] for m in members], cursor) if cursor else 0
+    page = members[start:start + limit]
+    more = start + limit < len(members)
+    return {
+        "module": module_name,
+        "members": page,
+        "total": len(members),
+        "next_cursor": page[-1]["name"] if page and more else None
+    }
+
+@api_router.get("/scanner/members/{module_name}/{member}/signature")
+async def get_member_signature(module_name: str, member: str):
+    """Signature, parameters and docstring summary of one member (e.g. `dumps` or `JSONDecoder.decode`)."""
+    return await introspect_or_404("signature", module_name, member)
+
+def normalize_dist_name(name: str) -> str:
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+class PackageIndex:
+    """Installed distributions, indexed once and rebuilt when sys.path dirs change.
+
+    Installing or removing a package adds or removes its .dist-info
+    directory, which bumps the mtime of the site-packages directory it
+    lives in; every lookup compares those mtimes and rebuilds on a change.
+    """
+
+    def __init__(self):
+        self._entries: List[dict] = []
+        self._by_name: Dict[str, dict] = {}
+        self._by_module: Dict[str, dict] = {}
+        self._stamp: Optional[tuple] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _current_stamp() -> tuple:
+        stamp = []
+        for path in sys.path:
             try:
-                sig = inspect.signature(obj)
-                entry["params"] = [
-                    {"name": p.name, "default": str(p.default) if p.default != inspect.Parameter.empty else None}
-                    for p in sig.parameters.values()
-                ]
-            except (ValueError, TypeError):
-                entry["params"] = []
-            
-            block_def = {
-                "type": f"{req.package_name}_{name}",
-                "message0": f"{req.package_name}.{name}(" + " ".join(f"%{i+1}" for i in range(len(entry.get("params", [])))) + ")",
-                "args0": [
-                    {"type": "input_value", "name": p["name"].upper(), "check": None}
-                    for p in entry.get("params", [])
-                ],
-                "output": None,
-                "colour": 160,
-                "tooltip": f"Call {req.package_name}.{name}",
-                "helpUrl": ""
+                stamp.append((path, os.stat(path or os.curdir).st_mtime_ns))
+            except OSError:
+                continue
+        return tuple(stamp)
+
+    @staticmethod
+    def _build() -> List[dict]:
+        from importlib import metadata
+        top_levels: Dict[str, List[str]] = {}
+        for module, dist_names in metadata.packages_distributions().items():
+            for dist_name in dist_names:
+                top_levels.setdefault(normalize_dist_name(dist_name), []).append(module)
+        entries = {}
+        for dist in metadata.distributions():
+            name = dist.metadata["Name"]
+            if not name:
+                continue
+            key = normalize_dist_name(name)
+            # Like imports, the first copy on sys.path wins
+            if key in entries:
+                continue
+            entries[key] = {
+                "name": name,
+                "key": key,
+                "version": dist.version,
+                "summary": dist.metadata.get("Summary") or "",
+                "top_level": sorted(m for m in top_levels.get(key, []) if not m.startswith('_')),
+                "requires": dist.requires or [],
+                "location": str(dist.locate_file('')),
             }
-            block_defs.append(block_def)
-        
-        elif inspect.isclass(obj):
-            entry["type"] = "class"
-            entry["methods"] = [m for m in dir(obj) if not m.startswith('_') and callable(getattr(obj, m, None))]
-        
-        modules.append(entry)
-    
-    return ScanResponse(
-        package_name=req.package_name,
-        modules=modules[:50],
-        block_definitions=block_defs[:30]
-    )
+        return sorted(entries.values(), key=lambda e: e["key"])
+
+    async def refresh(self):
+        """Rebuild the index if any sys.path directory changed since the last build."""
+        stamp = await asyncio.to_thread(self._current_stamp)
+        if stamp == self._stamp:
+            return
+        async with self._lock:
+            if stamp == self._stamp:
+                return
+            entries = await asyncio.to_thread(self._build)
+            self._entries = entries
+            self._by_name = {e["key"]: e for e in entries}
+            self._by_module = {m: e for e in entries for m in e["top_level"]}
+            self._stamp = stamp
+
+    async def get(self, name: str) -> Optional[dict]:
+        await self.refresh()
+        return self._by_name.get(normalize_dist_name(name))
+
+    async def for_module(self, module_name: str) -> Optional[dict]:
+        """The distribution providing a top-level module."""
+        await self.refresh()
+        return self._by_module.get(module_name)
+
+    async def search(self, query: str = "") -> List[dict]:
+        """Matching distributions, best first: exact, prefix, substring, then fuzzy.
+
+        Top-level module names match too, so "yaml" finds PyYAML.
+        """
+        await self.refresh()
+        query = normalize_dist_name(query.strip())
+        if not query:
+            return self._entries
+        fuzzy = re.compile('.*?'.join(map(re.escape, query)))
+        ranked = []
+        for entry in self._entries:
+            names = [entry["key"]] + [normalize_dist_name(m) for m in entry["top_level"]]
+            if query in names:
+                rank = 0
+            elif any(n.startswith(query) for n in names):
+                rank = 1
+            elif any(query in n for n in names):
+                rank = 2
+            elif fuzzy.search(entry["key"]):
+                rank = 3
+            else:
+                continue
+            ranked.append((rank, entry["key"], entry))
+        ranked.sort(key=lambda r: r[:2])
+        return [entry for _, _, entry in ranked]
+
+package_index = PackageIndex()
 
 @api_router.get("/scanner/installed")
-async def list_installed_packages():
-    """List installed Python packages."""
-    from importlib.metadata import distributions
-    packages = []
-    for dist in distributions():
-        packages.append({"name": dist.metadata["Name"], "version": dist.metadata["Version"]})
-    packages.sort(key=lambda x: x["name"].lower())
-    return {"packages": packages[:100]}
+async def list_installed_packages(
+    q: str = "",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """List installed Python packages, optionally filtered by a search query."""
+    matches = await package_index.search(q)
+    return {
+        "packages": [
+            {"name": e["name"], "version": e["version"], "top_level": e["top_level"]}
+            for e in matches[offset:offset + limit]
+        ],
+        "total": len(matches),
+        "offset": offset,
+        "limit": limit
+    }
+
+@api_router.get("/scanner/installed/{name}")
+async def get_installed_package(name: str):
+    """Metadata for one installed package."""
+    entry = await package_index.get(name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Package '{name}' is not installed")
+    return {k: v for k, v in entry.items() if k != "key"}
 
 # ─── File Save ────────────────────────────────────────────────────────────────
 
-@api_router.post("/files/save")
-async def save_file(req: SaveFileRequest):
-    """Save generated Python code to a specific file path."""
-    filepath = Path(req.filepath).expanduser().resolve()
-    filepath.mkdir(parents=True, exist_ok=True)
-    
+# Reading the umask means setting it, which races other threads, so do it once at import
+PROCESS_UMASK = os.umask(0o022)
+os.umask(PROCESS_UMASK)
+
+class AtomicFileWriter:
+    """Write a file through a temp file next to it, renamed into place on commit.
+
+    Readers see the old file or the new one, never a partial write. The
+    content is hashed as it is written, and commit() leaves the file alone
+    when it already holds the same bytes. The methods block; call them from
+    a worker thread.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        self._tmp = Path(tmp)
+        self._file = os.fdopen(fd, 'wb')
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+    def commit(self) -> bool:
+        """Move the new content into place; returns False if the file was already identical."""
+        self._file.flush()
+        if self.path.is_file() and self.path.stat().st_size == self.size and file_sha256(self.path) == self.sha256:
+            self.abort()
+            return False
+        os.fsync(self._file.fileno())
+        self._file.close()
+        try:
+            # Replacing a file keeps its mode
+            mode = self.path.stat().st_mode & 0o7777
+        except OSError:
+            # mkstemp creates 0o600; give new files what open() would
+            mode = 0o666 & ~PROCESS_UMASK
+        os.chmod(self._tmp, mode)
+        os.replace(self._tmp, self.path)
+        if sys.platform != 'win32':
+            # Make the rename itself durable
+            dir_fd = os.open(self.path.parent, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return True
+
+    def abort(self):
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def resolve_save_path(filepath: str, filename: str) -> Path:
     # Ensure filename ends with .py
-    filename = req.filename
     if not filename.endswith('.py'):
         filename += '.py'
-    
-    full_path = filepath / filename
-    full_path.write_text(req.code, encoding='utf-8')
-    
-    return {"status": "saved", "path": str(full_path), "size": len(req.code)}
+    return Path(filepath).expanduser().resolve() / filename
+
+def write_file_atomic(path: Path, data: bytes) -> tuple:
+    """Atomically write `data` to `path`; returns (writer, changed)."""
+    writer = AtomicFileWriter(path)
+    try:
+        writer.write(data)
+        return writer, writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+def saved_file_response(writer: AtomicFileWriter, changed: bool) -> dict:
+    return {
+        "status": "saved" if changed else "unchanged",
+        "path": str(writer.path),
+        "size": writer.size,
+        "sha256": writer.sha256
+    }
+
+@api_router.post("/files/save")
+async def save_file(req: SaveFileRequest):
+    """Save generated Python code to a specific file path.
+
+    The write is atomic and skipped when the file already has this content.
+    """
+    data = req.code.encode('utf-8')
+    if len(data) > FILE_SAVE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds {FILE_SAVE_MAX_BYTES} bytes")
+    full_path = resolve_save_path(req.filepath, req.filename)
+    writer, changed = await asyncio.to_thread(write_file_atomic, full_path, data)
+    return saved_file_response(writer, changed)
+
+@api_router.post("/files/save-stream")
+async def save_file_stream(request: Request, filepath: str, filename: str):
+    """Save the raw request body to a file, streamed to disk as it arrives.
+
+    Same atomic, skip-if-unchanged write as /files/save, for large files:
+    the body is never held in memory whole and the disk is only touched
+    from worker threads.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > FILE_SAVE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds {FILE_SAVE_MAX_BYTES} bytes")
+    full_path = resolve_save_path(filepath, filename)
+    writer = await asyncio.to_thread(AtomicFileWriter, full_path)
+    try:
+        pending: List[bytes] = []
+        pending_size = 0
+        async for chunk in request.stream():
+            if writer.size + pending_size + len(chunk) > FILE_SAVE_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"File exceeds {FILE_SAVE_MAX_BYTES} bytes")
+            pending.append(chunk)
+            pending_size += len(chunk)
+            # Hand the thread pool sizeable writes rather than every small chunk
+            if pending_size >= 1024 * 1024:
+                await asyncio.to_thread(writer.write, b"".join(pending))
+                pending, pending_size = [], 0
+        if pending:
+            await asyncio.to_thread(writer.write, b"".join(pending))
+        changed = await asyncio.to_thread(writer.commit)
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+    return saved_file_response(writer, changed)
+
+class DirectoryListingCache:
+    """Recent directory listings, reused while the directory's mtime is unchanged.
+
+    Adding, removing or renaming an entry bumps the directory's mtime, so
+    a listing is stale as soon as that changes; the TTL bounds how long
+    changes that leave it alone (an entry turning into a directory on some
+    network filesystems) can go unnoticed.
+    """
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self._listings: "OrderedDict[str, tuple]" = OrderedDict()
+        # listing() runs in worker threads; the scan itself happens outside the lock
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _scan(dir_path: Path) -> List[dict]:
+        items = []
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    # Answered from the directory entry itself on most filesystems
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                items.append({"name": entry.name, "is_dir": is_dir, "path": entry.path})
+        items.sort(key=lambda item: item["name"])
+        return items
+
+    def listing(self, dir_path: Path) -> List[dict]:
+        """Entries of a directory sorted by name (blocking; run in a thread)."""
+        key = str(dir_path)
+        mtime = dir_path.stat().st_mtime_ns
+        now = time.monotonic()
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is not None and cached[0] == mtime and now - cached[1] < self.ttl:
+                self._listings.move_to_end(key)
+                return cached[2]
+        items = self._scan(dir_path)
+        with self._lock:
+            self._listings[key] = (mtime, now, items)
+            self._listings.move_to_end(key)
+            if len(self._listings) > self.size:
+                self._listings.popitem(last=False)
+        return items
+
+dir_listings = DirectoryListingCache(DIR_LISTING_TTL, DIR_LISTING_CACHE_SIZE)
 
 @api_router.post("/files/list-dir")
 async def list_directory(data: dict):
-    """List directories for the file picker."""
+    """List directories for the file picker.
+
+    Optional keys: ``filter`` (case-insensitive substring of the name),
+    ``limit`` (default 200) and ``cursor`` (the ``next_cursor`` of the
+    previous page).
+    """
+    import bisect
     dir_path = Path(data.get("path", "/tmp")).expanduser().resolve()
-    if not dir_path.exists():
-        raise HTTPException(status_code=404, detail="Path not found")
-    
-    items = []
     try:
-        for item in sorted(dir_path.iterdir()):
-            if item.name.startswith('.'):
-                continue
-            items.append({
-                "name": item.name,
-                "is_dir": item.is_dir(),
-                "path": str(item),
-            })
+        limit = max(1, min(int(data.get("limit") or 200), 5000))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid limit")
+    try:
+        items = await asyncio.to_thread(dir_listings.listing, dir_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Path not found")
+    except NotADirectoryError:
+        raise HTTPException(status_code=400, detail="Not a directory")
     except PermissionError:
         raise HTTPException(status_code=403, detail="Permission denied")
     
+    name_filter = (data.get("filter") or "").lower()
+    if name_filter:
+        items = [item for item in items if name_filter in item["name"].lower()]
+    cursor = data.get("cursor")
+    start = bisect.bisect_right([item["name"] for item in items], cursor) if cursor else 0
+    page = items[start:start + limit]
+    
     return {
         "current": str(dir_path),
         "parent": str(dir_path.parent),
-        "items": items[:200]
+        "items": page,
+        "total": len(items),
+        "next_cursor": page[-1]["name"] if page and start + limit < len(items) else None
     }
 
-# ─── Scan Imports from Code ───────────────────────────────────────────────────
+# ─── Scan Imports from Code ───────────────────────────────────────────────────
+
+# Used where sys.stdlib_module_names (3.10+) isn't available
+STDLIB_FALLBACK = {
+    'os', 'sys', 'io', 'math', 'json', 'csv', 're', 'datetime', 'time',
+    'random', 'collections', 'itertools', 'functools', 'operator', 'string',
+    'pathlib', 'shutil', 'glob', 'tempfile', 'subprocess', 'threading',
+    'multiprocessing', 'socket', 'http', 'urllib', 'email', 'html', 'xml',
+    'logging', 'unittest', 'typing', 'abc', 'copy', 'pprint', 'textwrap',
+    'struct', 'codecs', 'hashlib', 'hmac', 'secrets', 'base64', 'binascii',
+    'pickle', 'shelve', 'sqlite3', 'zipfile', 'tarfile', 'gzip', 'bz2',
+    'lzma', 'configparser', 'argparse', 'getpass', 'platform', 'ctypes',
+    'array', 'queue', 'heapq', 'bisect', 'decimal', 'fractions', 'statistics',
+    'enum', 'dataclasses', 'contextlib', 'ast', 'dis', 'inspect', 'importlib',
+    'pkgutil', 'token', 'tokenize', 'traceback', 'warnings', 'atexit',
+    'signal', 'uuid', 'asyncio', 'concurrent', 'turtle', 'tkinter',
+    'webbrowser', 'cgi', 'cgitb', 'wsgiref', 'xmlrpc', 'ftplib', 'smtplib',
+    'imaplib', 'poplib', 'telnetlib', 'pdb', 'profile', 'cProfile',
+    'timeit', 'trace', 'gc', 'resource', 'sysconfig', 'venv',
+    'builtins', 'types', 'weakref',
+}
+STDLIB_MODULES = frozenset(getattr(sys, 'stdlib_module_names', ())) or frozenset(STDLIB_FALLBACK)
+
+pip_lock = asyncio.Lock()
+
+def parse_imports(code: str) -> Optional[set]:
+    """Top-level module names imported by `code`, or None if it doesn't parse."""
+    import ast
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    module_names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                module_names.add(alias.name.split('.')[0])
+        elif isinstance(node, ast.ImportFrom):
+            if node.module and not node.level:
+                module_names.add(node.module.split('.')[0])
+    return module_names
+
+def unavailable_module(name: str, installed: bool = False) -> dict:
+    return {"name": name, "available": False, "installed": installed, "functions": [], "classes": [], "constants": []}
+
+async def pip_install(names: List[str]) -> bool:
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, '-m', 'pip', 'install', '--quiet', *names,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        await asyncio.wait_for(proc.communicate(), timeout=PIP_INSTALL_TIMEOUT)
+    except BaseException as e:
+        # Timed out or cancelled (e.g. the client went away): pip must be gone
+        # before pip_lock is released, or the next run would overlap it
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+        if isinstance(e, asyncio.TimeoutError):
+            return False
+        raise
+    return proc.returncode == 0
+
+async def install_missing(names: List[str]) -> set:
+    """Install missing imports with one pip run; returns the names now importable."""
+    import importlib
+    async with pip_lock:
+        # Another scan may have installed some of them while we waited
+        importlib.invalidate_caches()
+        names = [n for n in names if await asyncio.to_thread(module_fingerprint, n) is None]
+        if names and not await pip_install(names) and len(names) > 1:
+            # One unknown name fails the whole batch; pip runs must not overlap, so retry
+            # one by one (a cancellation propagates out of pip_install and ends this)
+            for name in names:
+                await pip_install([name])
+        importlib.invalidate_caches()
+        if names:
+            introspector.forget_failures()
+    return {n for n in names if await asyncio.to_thread(module_fingerprint, n) is not None}
+
+async def summarize_module(name: str, installed: bool = False) -> dict:
+    try:
+        result = await introspector.introspect("summary", name)
+    except IntrospectionFailed as e:
+        logging.warning(f"Could not summarize module {name}: {e}")
+        return unavailable_module(name, installed)
+    if "error" in result:
+        return unavailable_module(name, installed)
+    return {**result, "installed": installed}
+
+async def resolve_imports(module_names: set):
+    """Yield a summary per module as soon as it is ready.
+
+    Modules are located with find_spec (nothing is imported here). Installed
+    ones are summarized right away from the scan cache or an introspection
+    worker, while the missing ones are installed in a single pip run.
+    """
+    names = sorted(module_names)
+    fingerprints = await asyncio.gather(*(asyncio.to_thread(module_fingerprint, n) for n in names))
+    pending = set()
+    missing = []
+    for name, fingerprint in zip(names, fingerprints):
+        if fingerprint is not None:
+            pending.add(asyncio.create_task(summarize_module(name)))
+        elif name in STDLIB_MODULES:
+            yield unavailable_module(name)
+        else:
+            missing.append(name)
+    install_task = asyncio.create_task(install_missing(missing)) if missing else None
+    if install_task is not None:
+        pending.add(install_task)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not install_task:
+                    yield task.result()
+                    continue
+                installed = task.result()
+                for name in missing:
+                    if name in installed:
+                        pending.add(asyncio.create_task(summarize_module(name, installed=True)))
+                    else:
+                        yield unavailable_module(name)
+    finally:
+        for task in pending:
+            task.cancel()
+
+class ImportScanSessions:
+    """What each session's last scan-imports call found, for incremental rescans.
+
+    The editor rescans on every change, so parsed import sets are cached by
+    code hash, and a session's previous results are reused for modules that
+    are still imported; only newly added modules get resolved, along with
+    ones previously unavailable that can now be found (e.g. installed from
+    the terminal since).
+    """
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max(1, max_sessions)
+        self._parsed: "OrderedDict[str, Optional[frozenset]]" = OrderedDict()
+        self._sessions: "OrderedDict[str, Dict[str, dict]]" = OrderedDict()
+
+    def parse(self, code: str) -> Optional[frozenset]:
+        key = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        if key in self._parsed:
+            self._parsed.move_to_end(key)
+            return self._parsed[key]
+        names = parse_imports(code)
+        self._parsed[key] = frozenset(names) if names is not None else None
+        if len(self._parsed) > self.max_sessions * 4:
+            self._parsed.popitem(last=False)
+        return self._parsed[key]
+
+    def previous(self, session_id: Optional[str]) -> Dict[str, dict]:
+        if session_id is None or session_id not in self._sessions:
+            return {}
+        self._sessions.move_to_end(session_id)
+        return self._sessions[session_id]
+
+    def remember(self, session_id: Optional[str], results: Dict[str, dict]):
+        if session_id is None:
+            return
+        self._sessions[session_id] = results
+        self._sessions.move_to_end(session_id)
+        if len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def plan(self, req: ScanImportsRequest) -> tuple:
+        """Return (reused results, modules to resolve, modules no longer imported)."""
+        previous = self.previous(req.session_id)
+        module_names = self.parse(req.code)
+        if module_names is None:
+            # Mid-edit code that doesn't parse keeps the last good result
+            return dict(previous), set(), set()
+        reused = {name: previous[name] for name in module_names if name in previous}
+        unavailable = [name for name, info in reused.items() if not info.get("available")]
+        found = await asyncio.gather(*(asyncio.to_thread(module_fingerprint, name) for name in unavailable))
+        for name, fingerprint in zip(unavailable, found):
+            # Found now, and not already known to fail to import as installed
+            if fingerprint is not None and not introspector.failed("summary", name, fingerprint):
+                del reused[name]
+        return reused, set(module_names) - reused.keys(), set(previous) - module_names
+
+import_sessions = ImportScanSessions(IMPORT_SCAN_SESSIONS)
 
 @api_router.post("/scanner/scan-imports", response_model=ScanImportsResponse)
 async def scan_imports(req: ScanImportsRequest):
-    """Parse code to find all imports, auto-install missing ones, then scan for block generation."""
-    import ast
-    import importlib
-    import inspect
-    
-    found_imports = []
-    
-    try:
-        tree = ast.parse(req.code)
-    except SyntaxError:
-        return ScanImportsResponse(imports=[])
-    
-    module_names = set()
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                module_names.add(alias.name.split('.')[0])
-        elif isinstance(node, ast.ImportFrom):
-            if node.module:
-                module_names.add(node.module.split('.')[0])
-    
-    # Standard library modules that don't need pip install
-    stdlib = {
-        'os', 'sys', 'io', 'math', 'json', 'csv', 're', 'datetime', 'time',
-        'random', 'collections', 'itertools', 'functools', 'operator', 'string',
-        'pathlib', 'shutil', 'glob', 'tempfile', 'subprocess', 'threading',
-        'multiprocessing', 'socket', 'http', 'urllib', 'email', 'html', 'xml',
-        'logging', 'unittest', 'typing', 'abc', 'copy', 'pprint', 'textwrap',
-        'struct', 'codecs', 'hashlib', 'hmac', 'secrets', 'base64', 'binascii',
-        'pickle', 'shelve', 'sqlite3', 'zipfile', 'tarfile', 'gzip', 'bz2',
-        'lzma', 'configparser', 'argparse', 'getpass', 'platform', 'ctypes',
-        'array', 'queue', 'heapq', 'bisect', 'decimal', 'fractions', 'statistics',
-        'enum', 'dataclasses', 'contextlib', 'ast', 'dis', 'inspect', 'importlib',
-        'pkgutil', 'token', 'tokenize', 'traceback', 'warnings', 'atexit',
-        'signal', 'uuid', 'asyncio', 'concurrent', 'turtle', 'tkinter',
-        'webbrowser', 'cgi', 'cgitb', 'wsgiref', 'xmlrpc', 'ftplib', 'smtplib',
-        'imaplib', 'poplib', 'telnetlib', 'pdb', 'profile', 'cProfile',
-        'timeit', 'trace', 'gc', 'resource', 'sysconfig', 'venv',
-        'builtins', 'types', 'weakref',
-    }
-    
-    for mod_name in sorted(module_names):
-        mod_info = {
-            "name": mod_name,
-            "available": False,
-            "installed": False,
-            "functions": [],
-            "classes": [],
-            "constants": [],
-        }
-        
-        # Try importing first
-        try:
-            mod = importlib.import_module(mod_name)
-            mod_info["available"] = True
-        except ImportError:
-            # Auto-install if not a stdlib module
-            if mod_name not in stdlib:
-                try:
-                    proc = await asyncio.create_subprocess_exec(
-                        sys.executable, '-m', 'pip', 'install', mod_name, '--quiet',
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE,
-                    )
-                    await asyncio.wait_for(proc.communicate(), timeout=60)
-                    if proc.returncode == 0:
-                        mod_info["installed"] = True
-                        importlib.invalidate_caches()
-                        mod = importlib.import_module(mod_name)
-                        mod_info["available"] = True
-                except Exception:
-                    pass
-            
-            if not mod_info["available"]:
-                found_imports.append(mod_info)
-                continue
-        
-        try:
-            # Limit inspection to prevent timeout on large modules like 'os'
-            member_count = 0
-            max_members = 100
-            
-            for name, obj in inspect.getmembers(mod):
-                if name.startswith('_'):
-                    continue
-                
-                member_count += 1
-                if member_count > max_members:
-                    break
-                
-                if inspect.isfunction(obj) or inspect.isbuiltin(obj):
-                    if len(mod_info["functions"]) >= 30:
-                        continue
-                    func_info = {"name": name, "type": "function"}
-                    try:
-                        sig = inspect.signature(obj)
-                        func_info["params"] = [
-                            p.name for p in list(sig.parameters.values())[:10]
-                            if p.name != 'self'
-                        ]
-                    except (ValueError, TypeError):
-                        func_info["params"] = []
-                    mod_info["functions"].append(func_info)
-                
-                elif inspect.isclass(obj):
-                    if len(mod_info["classes"]) >= 10:
-                        continue
-                    cls_info = {"name": name, "type": "class", "methods": []}
-                    method_count = 0
-                    for mname, mobj in inspect.getmembers(obj):
-                        if mname.startswith('_') and mname != '__init__':
-                            continue
-                        if callable(mobj):
-                            method_count += 1
-                            if method_count > 10:
-                                break
-                            method_info = {"name": mname, "params": []}
-                            cls_info["methods"].append(method_info)
-                    mod_info["classes"].append(cls_info)
-                
-                elif not callable(obj):
-                    if len(mod_info["constants"]) >= 15:
-                        continue
-                    try:
-                        mod_info["constants"].append({"name": name, "type": type(obj).__name__})
-                    except Exception:
-                        pass
-        except Exception:
-            pass
-        
-        found_imports.append(mod_info)
-    
-    return ScanImportsResponse(imports=found_imports)
+    """Parse code to find all imports, auto-install missing ones, then scan for block generation.
+
+    With a session_id, only imports added since that session's last scan are
+    resolved; `added` and `removed` list what changed.
+    """
+    results, added, removed = await import_sessions.plan(req)
+    async for info in resolve_imports(added):
+        results[info["name"]] = info
+    import_sessions.remember(req.session_id, results)
+    return ScanImportsResponse(
+        imports=sorted(results.values(), key=lambda info: info["name"]),
+        added=sorted(added),
+        removed=sorted(removed)
+    )
+
+@api_router.post("/scanner/scan-imports/stream")
+async def scan_imports_stream(req: ScanImportsRequest):
+    """Like /scanner/scan-imports, but streams one JSON line per module as it resolves.
+
+    Results reused from the session's last scan come first.
+    """
+    results, added, _ = await import_sessions.plan(req)
+
+    async def lines():
+        for name in sorted(results):
+            yield json.dumps(results[name]) + "\n"
+        async for info in resolve_imports(added):
+            results[info["name"]] = info
+            yield json.dumps(info) + "\n"
+        import_sessions.remember(req.session_id, results)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 # ─── Custom Blocks (My Blocks / Scratch-like) ────────────────────────────────
 
 @api_router.post("/custom-blocks")
 async def save_custom_block(block: CustomBlockDef):
     """Save a reusable custom block definition."""
-    blocks = load_custom_blocks()
     doc = block.model_dump()
     doc["id"] = str(uuid.uuid4())
     doc["created_at"] = datetime.now(timezone.utc).isoformat()
-    blocks.append(doc)
-    save_custom_blocks(blocks)
+    async with custom_block_cache.changing():
+        async with db_pool.write() as db:
+            await db.execute(SQL_INSERT_CUSTOM_BLOCK, custom_block_values(doc))
+        custom_block_cache.added(doc)
     return doc
 
 @api_router.get("/custom-blocks")
-async def list_custom_blocks():
-    """List all custom block definitions."""
-    blocks = load_custom_blocks()
-    return {"blocks": blocks}
+async def list_custom_blocks(
+    request: Request,
+    name: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None
+):
+    """List custom block definitions, oldest first.
+
+    Without ``limit`` every block is returned, from memory and with an ETag
+    (If-None-Match gets a 304 while nothing changed); with it, one page plus
+    a ``next_cursor`` for the following one. ``name`` returns only blocks
+    with that exact name.
+    """
+    if name is None and limit is None:
+        body = await custom_block_cache.listing()
+        headers = {"ETag": custom_block_cache.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+    if name is not None:
+        sql, params = SQL_FIND_CUSTOM_BLOCKS_BY_NAME, (name,)
+    elif cursor:
+        sql, params = SQL_LIST_CUSTOM_BLOCKS_AFTER, (*decode_keyset_cursor(cursor), limit + 1)
+    else:
+        sql, params = SQL_LIST_CUSTOM_BLOCKS_PAGE, (limit + 1,)
+    async with db_pool.read() as db:
+        async with db.execute(sql, params) as cur:
+            blocks = [custom_block_from_row(row) for row in await cur.fetchall()]
+    if name is not None:
+        return {"blocks": blocks}
+    next_cursor = None
+    if len(blocks) > limit:
+        blocks = blocks[:limit]
+        next_cursor = encode_keyset_cursor(blocks[-1]["created_at"], blocks[-1]["id"])
+    return {"blocks": blocks, "next_cursor": next_cursor}
+
+@api_router.get("/custom-blocks/{block_id}")
+async def get_custom_block(block_id: str):
+    block = await custom_block_cache.get(block_id)
+    if block is None:
+        raise HTTPException(status_code=404, detail="Custom block not found")
+    return block
 
 @api_router.delete("/custom-blocks/{block_id}")
 async def delete_custom_block(block_id: str):
-    blocks = load_custom_blocks()
-    filtered = [b for b in blocks if b.get("id") != block_id]
-    if len(filtered) == len(blocks):
+    async with custom_block_cache.changing():
+        async with db_pool.write() as db:
+            cur = await db.execute(SQL_DELETE_CUSTOM_BLOCK, (block_id,))
+            deleted = cur.rowcount
+        if deleted:
+            custom_block_cache.deleted(block_id)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Custom block not found")
-    save_custom_blocks(filtered)
     return {"status": "deleted"}
 
+# ─── WebSocket: Custom Block Changes ─────────────────────────────────────────
+
+@app.websocket("/api/ws/custom-blocks")
+async def ws_custom_blocks(websocket: WebSocket):
+    """Push custom block additions and deletions to connected editors.
+
+    Sends {"type": "hello", "etag"} first; a client whose copy has another
+    ETag refetches the listing. After that every change arrives as
+    {"type": "added", "block"} or {"type": "deleted", "id"} with the new
+    ETag, or {"type": "resync"} if this client fell too far behind.
+    """
+    await websocket.accept()
+    queue = custom_block_cache.subscribe()
+
+    async def send_events():
+        await websocket.send_text(json.dumps({"type": "hello", "etag": custom_block_cache.etag}))
+        while True:
+            await websocket.send_text(json.dumps(await queue.get()))
+
+    sender = asyncio.create_task(send_events())
+    try:
+        # Clients don't send anything; receiving just notices the disconnect
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        custom_block_cache.unsubscribe(queue)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+
 # ─── WebSocket: Live Output ──────────────────────────────────────────────────
 
+class OutputBatcher:
+    """Coalesces a run's stdout/stderr into time- and size-bounded messages.
+
+    Pipes are read in large chunks and decoded incrementally, and a single
+    sender flushes what has accumulated every OUTPUT_FLUSH_INTERVAL (sooner
+    once OUTPUT_FLUSH_BYTES are pending), one message per stream segment so
+    the message format stays {"type": "stdout"|"stderr", "data", "run_id"}.
+    While OUTPUT_SEND_BUFFER_BYTES wait to be sent the readers stop reading,
+    so a slow client fills the child's pipe and blocks it instead of growing
+    server memory.
+    """
+
+    def __init__(self, send, run_id: str, limit: int, on_overflow):
+        self._send = send
+        self.run_id = run_id
+        self.limit = limit
+        self.on_overflow = on_overflow
+        self.output_bytes = 0
+        self.truncated = False
+        self._segments: List[list] = []  # [stream_type, [text, ...]] in arrival order
+        self._pending = 0
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._has_data = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+        self._sender = asyncio.create_task(self._send_loop())
+
+    async def pump(self, stream: asyncio.StreamReader, stream_type: str):
+        """Read one pipe to EOF (or until the output cap) into the batch."""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while not self.truncated:
+            chunk = await stream.read(OUTPUT_FLUSH_BYTES)
+            if not chunk:
+                break
+            if self.limit and self.output_bytes + len(chunk) > self.limit:
+                chunk = chunk[:self.limit - self.output_bytes]
+                self.truncated = True
+            self.output_bytes += len(chunk)
+            await self._add(stream_type, decoder.decode(chunk), len(chunk))
+            if self.truncated:
+                self.on_overflow()
+                await self._add(stream_type, decoder.decode(b'', final=True), 0)
+                await self._add("stderr", f"\n[Output truncated at {self.limit} bytes; program stopped]\n", 0)
+                return
+        await self._add(stream_type, decoder.decode(b'', final=True), 0)
+
+    async def _add(self, stream_type: str, text: str, size: int):
+        if self._error is not None:
+            raise self._error
+        if not text:
+            return
+        while self._pending >= OUTPUT_SEND_BUFFER_BYTES:
+            self._has_room.clear()
+            await self._has_room.wait()
+            if self._error is not None:
+                raise self._error
+        if self._segments and self._segments[-1][0] == stream_type:
+            self._segments[-1][1].append(text)
+        else:
+            self._segments.append([stream_type, [text]])
+        self._pending += size
+        self._has_data.set()
+        if self._pending >= OUTPUT_FLUSH_BYTES:
+            self._batch_ready.set()
+
+    async def _send_loop(self):
+        try:
+            while True:
+                await self._has_data.wait()
+                if self._pending < OUTPUT_FLUSH_BYTES and not self._closed:
+                    # Give the program one interval to produce more before sending
+                    try:
+                        await asyncio.wait_for(self._batch_ready.wait(), OUTPUT_FLUSH_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                segments, self._segments = self._segments, []
+                self._pending = 0
+                self._has_data.clear()
+                self._batch_ready.clear()
+                self._has_room.set()
+                for stream_type, texts in segments:
+                    await self._send({"type": stream_type, "data": "".join(texts), "run_id": self.run_id})
+                if self._closed and not self._segments:
+                    return
+        except Exception as exc:
+            # Client went away; unblock the readers so the run can be torn down
+            self._error = exc
+            self._has_room.set()
+
+    async def close(self):
+        """Send whatever is still buffered and stop the sender."""
+        self._closed = True
+        self._has_data.set()
+        self._batch_ready.set()
+        await self._sender
+        if self._error is not None:
+            raise self._error
+
+    async def abort(self):
+        """Stop the sender without flushing, when the run is torn down by an error."""
+        self._sender.cancel()
+        await asyncio.gather(self._sender, return_exceptions=True)
+
+
 @app.websocket("/api/ws/output")
 async def ws_output(websocket: WebSocket):
     await websocket.accept()
+    connection_id = str(uuid.uuid4())
+    connection_runs = set()
+    # Queue-position notices are sent from scheduler callbacks; kept until done
+    # so they aren't collected mid-send, and drained before the run starts
+    notices = set()
+    
+    def notice_sent(task):
+        notices.discard(task)
+        if not task.cancelled():
+            # A failed send means the client left; the receive loop sees that too
+            task.exception()
+    
     try:
         while True:
             data = await websocket.receive_text()
@@ -546,60 +2694,486 @@ async def ws_output(websocket: WebSocket):
             
             if msg.get("type") == "execute":
                 code = msg.get("code", "")
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, dir='/tmp') as f:
-                    f.write(code)
-                    tmp_path = f.name
+                run_id = str(uuid.uuid4())
+                
+                def report_position(position, run_id=run_id):
+                    task = asyncio.create_task(websocket.send_text(json.dumps({
+                        "type": "queued",
+                        "position": position,
+                        "run_id": run_id
+                    })))
+                    notices.add(task)
+                    task.add_done_callback(notice_sent)
                 
+                session_id = msg.get("session_id") or connection_id
                 try:
-                    proc = await asyncio.create_subprocess_exec(
-                        sys.executable, '-u', tmp_path,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE,
-                        cwd='/tmp'
-                    )
-                    
-                    run_id = str(uuid.uuid4())
-                    await websocket.send_text(json.dumps({"type": "started", "run_id": run_id}))
-                    
-                    async def read_stream(stream, stream_type):
-                        while True:
-                            line = await stream.readline()
-                            if not line:
-                                break
+                    async with exec_scheduler.slot(session_id, report_position):
+                        worker = await exec_pool.run(code)
+                        connection_runs.add(run_id)
+                        # Every "queued" notice goes out before "started"
+                        await asyncio.gather(*notices, return_exceptions=True)
+                        await websocket.send_text(json.dumps({"type": "started", "run_id": run_id}))
+                        batcher = OutputBatcher(
+                            lambda message: websocket.send_text(json.dumps(message)),
+                            run_id, EXEC_STREAM_MAX_OUTPUT_BYTES, worker.kill
+                        )
+                        
+                        timed_out = False
+                        async with run_registry.track(run_id, session_id, worker) as record:
+                            try:
+                                await asyncio.wait_for(
+                                    gather_or_cancel(
+                                        batcher.pump(worker.proc.stdout, "stdout"),
+                                        batcher.pump(worker.proc.stderr, "stderr"),
+                                        worker.finish()
+                                    ),
+                                    timeout=EXEC_TIMEOUT or None
+                                )
+                            except asyncio.TimeoutError:
+                                timed_out = True
+                                worker.kill()
+                                await batcher.close()
+                                await websocket.send_text(json.dumps({
+                                    "type": "stderr",
+                                    "data": f"Execution timed out ({EXEC_TIMEOUT:g}s limit)\n",
+                                    "run_id": run_id
+                                }))
+                            except BaseException:
+                                worker.kill()
+                                await batcher.abort()
+                                raise
+                            await batcher.close()
+                            
+                            usage = await worker.finish()
+                            connection_runs.discard(run_id)
+                        exit_code = worker.proc.returncode
+                        # Stops, truncation and timeouts kill the run too; they aren't the CPU limit
+                        if not (record.stopped or batcher.truncated or timed_out) and describe_exit(exit_code):
                             await websocket.send_text(json.dumps({
-                                "type": stream_type,
-                                "data": line.decode('utf-8', errors='replace'),
+                                "type": "stderr",
+                                "data": describe_exit(exit_code) + "\n",
                                 "run_id": run_id
                             }))
-                    
-                    await asyncio.gather(
-                        read_stream(proc.stdout, "stdout"),
-                        read_stream(proc.stderr, "stderr")
-                    )
-                    
-                    exit_code = await proc.wait()
+                except SchedulerFull:
                     await websocket.send_text(json.dumps({
-                        "type": "finished",
-                        "exit_code": exit_code,
+                        "type": "rejected",
+                        "reason": "Too many runs queued, try again shortly",
                         "run_id": run_id
                     }))
-                finally:
-                    try:
-                        os.unlink(tmp_path)
-                    except Exception:
-                        pass
+                    continue
+                
+                await websocket.send_text(json.dumps({
+                    "type": "finished",
+                    "exit_code": exit_code,
+                    "run_id": run_id,
+                    "cpu_time": usage.get("cpu_time"),
+                    "peak_rss": usage.get("peak_rss"),
+                    "output_bytes": batcher.output_bytes,
+                    "truncated": batcher.truncated,
+                    "stopped": record.stopped
+                }))
                     
     except WebSocketDisconnect:
         pass
+    finally:
+        for task in list(notices):
+            task.cancel()
+        # Nobody is left to read the output of this connection's runs
+        for run_id in list(connection_runs):
+            run_registry.stop(run_id=run_id)
 
 # ─── WebSocket: Terminal (Windows Compatible) ────────────────────────────────
 
+class PtyReader:
+    """Reads a PTY master from the event loop and hands out coalesced chunks.
+
+    The fd is registered with loop.add_reader, so no executor thread sits
+    waiting on it. After a chunk is handed out, the next one waits for the
+    rest of TERMINAL_FLUSH_INTERVAL to collect more output: keystroke echoes
+    go out at once, while a flood becomes a few large frames. Reading pauses
+    while TERMINAL_BUFFER_BYTES are waiting to be taken.
+    """
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self._loop = asyncio.get_running_loop()
+        self._buffer = bytearray()
+        self._ready = asyncio.Event()
+        self._reading = False
+        self._eof = False
+        self._last_chunk = 0.0
+
+    def start(self):
+        self._resume()
+
+    def _resume(self):
+        if not self._reading and not self._eof:
+            self._loop.add_reader(self.fd, self._on_readable)
+            self._reading = True
+
+    def _pause(self):
+        if self._reading:
+            self._loop.remove_reader(self.fd)
+            self._reading = False
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, TERMINAL_FRAME_BYTES)
+        except BlockingIOError:
+            return
+        except OSError:
+            # EIO once the shell has exited and the slave side is closed
+            data = b''
+        if not data:
+            self._eof = True
+            self._pause()
+        else:
+            self._buffer += data
+            if len(self._buffer) >= TERMINAL_BUFFER_BYTES:
+                self._pause()
+        self._ready.set()
+
+    async def read(self) -> bytes:
+        """The next chunk of output (at most TERMINAL_FRAME_BYTES); b'' once the shell is gone."""
+        while not self._buffer:
+            if self._eof:
+                return b''
+            self._ready.clear()
+            await self._ready.wait()
+        wait = self._last_chunk + TERMINAL_FLUSH_INTERVAL - self._loop.time()
+        if wait > 0 and len(self._buffer) < TERMINAL_FRAME_BYTES:
+            await asyncio.sleep(wait)
+        chunk = bytes(self._buffer[:TERMINAL_FRAME_BYTES])
+        del self._buffer[:TERMINAL_FRAME_BYTES]
+        self._last_chunk = self._loop.time()
+        if len(self._buffer) < TERMINAL_BUFFER_BYTES:
+            self._resume()
+        return chunk
+
+    def close(self):
+        self._pause()
+        self._eof = True
+        self._ready.set()
+
+def reap_shell(pid: int, grace: float = 2.0):
+    """Hang up a terminal's shell and collect it without blocking the loop.
+
+    Interactive shells ignore SIGTERM, so they get SIGHUP like a closed
+    terminal would send, and SIGKILL if still around after `grace` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + grace
+
+    def poll():
+        try:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if done:
+            return
+        if loop.time() >= deadline:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        loop.call_later(0.1, poll)
+
+    try:
+        os.kill(pid, signal.SIGHUP)
+    except ProcessLookupError:
+        pass
+    poll()
+
+# Terminal frames are binary WebSocket messages: one type byte, then the payload.
+#   TERM_DATA    PTY output (server to client) or keyboard input (client to server), raw bytes
+#   TERM_RESIZE  rows and cols as two big-endian uint16
+#   TERM_ACK     bytes of TERM_DATA the client has written to its screen, big-endian uint32
+#   TERM_SESSION the session id the connection is attached to (server to client, ASCII)
+#   TERM_CLOSE   end the session and its shell instead of leaving it to idle out (client to server);
+#                on the multiplexed connection also sent by the server when a channel's shell has ended
+#   TERM_OPEN    attach a channel of the multiplexed connection to a session: the id to reattach, or empty
+# On /api/ws/terminal-mux a big-endian uint16 channel id follows the type byte.
+TERM_DATA, TERM_RESIZE, TERM_ACK, TERM_SESSION, TERM_CLOSE, TERM_OPEN = 0, 1, 2, 3, 4, 5
+# Close code for a multiplexed connection the platform can't serve; clients fall back to /api/ws/terminal
+TERMINAL_MUX_UNSUPPORTED = 4001
+
+def terminal_frame(kind: int, payload: bytes = b'') -> bytes:
+    return bytes((kind,)) + payload
+
+async def receive_terminal_frame(websocket: WebSocket) -> Optional[tuple]:
+    """The client's next (kind, payload); None once it has gone. Text and empty messages are skipped."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return None
+        data = message.get("bytes")
+        if data:
+            return data[0], data[1:]
+
+def parse_resize(payload: bytes) -> Optional[tuple]:
+    if len(payload) != 4:
+        return None
+    rows, cols = struct.unpack('>HH', payload)
+    return (rows, cols) if rows and cols else None
+
+def parse_ack(payload: bytes) -> int:
+    return struct.unpack('>I', payload)[0] if len(payload) == 4 else 0
+
+class TerminalCredit:
+    """Credit-based flow control for terminal output.
+
+    Output is charged when sent and refunded when the client acknowledges
+    having written it to its screen. Once TERMINAL_WINDOW_BYTES are
+    outstanding, wait() holds the sender, the PTY reader fills up and stops
+    reading, and the kernel blocks the program writing to the terminal.
+    """
+
+    def __init__(self, window: int = TERMINAL_WINDOW_BYTES):
+        self.window = window
+        self.outstanding = 0
+        self._open = asyncio.Event()
+        self._open.set()
+
+    def sent(self, size: int):
+        self.outstanding += size
+        if self.outstanding >= self.window:
+            self._open.clear()
+
+    def acked(self, size: int):
+        self.outstanding = max(0, self.outstanding - size)
+        if self.outstanding < self.window:
+            self._open.set()
+
+    async def wait(self):
+        await self._open.wait()
+
+    def reset(self):
+        self.outstanding = 0
+        self._open.set()
+
+async def write_pty(fd: int, data: bytes):
+    """Write all of `data` to a non-blocking PTY, waiting for room when the shell isn't reading."""
+    loop = asyncio.get_running_loop()
+    view = memoryview(data)
+    while view:
+        try:
+            view = view[os.write(fd, view):]
+        except BlockingIOError:
+            writable = loop.create_future()
+            loop.add_writer(fd, writable.set_result, None)
+            try:
+                await writable
+            finally:
+                loop.remove_writer(fd)
+
+class ScrollbackBuffer:
+    """The most recent terminal output, bounded to `limit` bytes."""
+
+    def __init__(self, limit: int = TERMINAL_SCROLLBACK_BYTES):
+        self.limit = limit
+        self.size = 0
+        self._chunks = deque()
+
+    def append(self, data: bytes):
+        self._chunks.append(data)
+        self.size += len(data)
+        while self.size > self.limit:
+            oldest = self._chunks[0]
+            excess = self.size - self.limit
+            if len(oldest) <= excess:
+                self._chunks.popleft()
+                self.size -= len(oldest)
+                continue
+            # Cut after a line break where possible, so a replay doesn't start
+            # halfway through a character or an escape sequence
+            newline = oldest.find(b'\n', excess)
+            cut = newline + 1 if newline != -1 else excess
+            self._chunks[0] = oldest[cut:]
+            self.size -= cut
+
+    def snapshot(self) -> bytes:
+        return b''.join(self._chunks)
+
+class TerminalViewer:
+    """A WebSocket attached to a terminal session, with its own flow-control credit."""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.credit = TerminalCredit()
+        # Held while the scrollback is replayed so live output can't overtake it
+        self.lock = asyncio.Lock()
+
+    async def send(self, kind: int, payload: bytes = b''):
+        await self.websocket.send_bytes(terminal_frame(kind, payload))
+        if kind == TERM_DATA:
+            self.credit.sent(len(payload))
+
+class TerminalSession:
+    """A shell on a PTY that survives its viewers.
+
+    Output is read continuously into a scrollback ring and fanned out to
+    every attached viewer; the slowest viewer's credit sets the pace. With
+    nobody attached the shell keeps running for TERMINAL_IDLE_TIMEOUT
+    seconds, its output going only to the scrollback, and is then closed.
+    """
+
+    def __init__(self, session_id: str, pid: int, fd: int, on_close=None):
+        self.id = session_id
+        self.pid = pid
+        self.fd = fd
+        self.viewers = set()
+        self.scrollback = ScrollbackBuffer()
+        self.closed = asyncio.Event()
+        self._reader = PtyReader(fd)
+        self._input = asyncio.Queue()
+        self._on_close = on_close
+        self._idle_timer = None
+        self._tasks = []
+
+    @classmethod
+    def spawn(cls, session_id: str, on_close=None, rows: int = 24, cols: int = 80) -> 'TerminalSession':
+        import pty
+        import fcntl
+
+        shell = os.environ.get('SHELL', '/bin/bash')
+        pid, fd = pty.fork()
+        if pid == 0:
+            # Child process
+            try:
+                os.execvp(shell, [shell])
+            finally:
+                os._exit(1)
+
+        fl = fcntl.fcntl(fd, fcntl.F_GETFL)
+        fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
+        session = cls(session_id, pid, fd, on_close)
+        session.resize(rows, cols)
+        session.start()
+        return session
+
+    def start(self):
+        self._reader.start()
+        self._tasks = [asyncio.create_task(self._pump()), asyncio.create_task(self._feed())]
+        self._schedule_idle_close()
+
+    async def _pump(self):
+        try:
+            while True:
+                for viewer in list(self.viewers):
+                    await viewer.credit.wait()
+                data = await self._reader.read()
+                if not data:
+                    break
+                self.scrollback.append(data)
+                # Taken right after the append: viewers attaching from here on get this chunk in their replay
+                for viewer in list(self.viewers):
+                    try:
+                        async with viewer.lock:
+                            await viewer.send(TERM_DATA, data)
+                    except Exception:
+                        self.detach(viewer)
+        finally:
+            self.close()
+
+    async def _feed(self):
+        # Input waits here while the shell isn't reading, so acks keep flowing meanwhile
+        while True:
+            await write_pty(self.fd, await self._input.get())
+
+    async def attach(self, viewer: TerminalViewer):
+        """Add a viewer: it is told the session id, then sent the scrollback, then live output."""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        async with viewer.lock:
+            replay = self.scrollback.snapshot()
+            self.viewers.add(viewer)
+            await viewer.send(TERM_SESSION, self.id.encode('ascii'))
+            for start in range(0, len(replay), TERMINAL_FRAME_BYTES):
+                await viewer.send(TERM_DATA, replay[start:start + TERMINAL_FRAME_BYTES])
+
+    def detach(self, viewer: TerminalViewer):
+        self.viewers.discard(viewer)
+        # Nothing waits on a viewer that's gone
+        viewer.credit.reset()
+        if not self.viewers:
+            self._schedule_idle_close()
+
+    def _schedule_idle_close(self):
+        if not self.viewers and self._idle_timer is None and not self.closed.is_set():
+            self._idle_timer = asyncio.get_running_loop().call_later(TERMINAL_IDLE_TIMEOUT, self.close)
+
+    def handle(self, viewer: TerminalViewer, kind: int, payload: bytes):
+        """Act on a frame from one of the viewers."""
+        if kind == TERM_DATA:
+            self._input.put_nowait(payload)
+        elif kind == TERM_RESIZE:
+            size = parse_resize(payload)
+            if size:
+                self.resize(*size)
+        elif kind == TERM_ACK:
+            viewer.credit.acked(parse_ack(payload))
+        elif kind == TERM_CLOSE:
+            self.close()
+
+    def resize(self, rows: int, cols: int):
+        import fcntl
+        import termios
+
+        try:
+            fcntl.ioctl(self.fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+        except OSError:
+            pass
+
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current:
+                task.cancel()
+        self._reader.close()
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        reap_shell(self.pid)
+        if self._on_close:
+            self._on_close(self)
+
+class TerminalSessions:
+    """Live terminal sessions by id, so a reloaded page can reattach to its shell."""
+
+    def __init__(self):
+        self._sessions: Dict[str, TerminalSession] = {}
+
+    def get(self, session_id: Optional[str]) -> Optional[TerminalSession]:
+        return self._sessions.get(session_id) if session_id else None
+
+    def create(self) -> TerminalSession:
+        session = TerminalSession.spawn(uuid.uuid4().hex, on_close=self._forget)
+        self._sessions[session.id] = session
+        return session
+
+    def _forget(self, session: TerminalSession):
+        self._sessions.pop(session.id, None)
+
+    def close_all(self):
+        for session in list(self._sessions.values()):
+            session.close()
+
+terminal_sessions = TerminalSessions()
+
 @app.websocket("/api/ws/terminal")
 async def ws_terminal(websocket: WebSocket):
     """Terminal WebSocket - Robust, SSH-like, multi-session support"""
     await websocket.accept()
     
     if sys.platform == 'win32':
+        credit = TerminalCredit()
         # Windows: Use winpty for proper PTY support
         try:
             from winpty import PtyProcess
@@ -613,13 +3187,16 @@ async def ws_terminal(websocket: WebSocket):
                 try:
                     while proc.isalive():
                         try:
+                            await credit.wait()
                             # Non-blocking read with timeout
                             data = await loop.run_in_executor(
                                 None, 
                                 lambda: proc.read(1024) if proc.isalive() else None
                             )
                             if data:
-                                await websocket.send_text(data)
+                                data = data.encode('utf-8')
+                                await websocket.send_bytes(terminal_frame(TERM_DATA, data))
+                                credit.sent(len(data))
                             else:
                                 await asyncio.sleep(0.01)
                         except Exception:
@@ -631,17 +3208,16 @@ async def ws_terminal(websocket: WebSocket):
                 """Receive from WebSocket and write to PTY"""
                 try:
                     while proc.isalive():
-                        data = await websocket.receive_text()
-                        if data.startswith('RESIZE:'):
-                            try:
-                                _, rows, cols = data.split(':')
-                                proc.setwinsize(int(rows), int(cols))
-                            except Exception:
-                                pass
-                        else:
-                            proc.write(data)
-                except WebSocketDisconnect:
-                    pass
+                        frame = await receive_terminal_frame(websocket)
+                        if frame is None:
+                            break
+                        kind, payload = frame
+                        if kind == TERM_DATA:
+                            proc.write(payload.decode('utf-8', errors='replace'))
+                        elif kind == TERM_RESIZE and parse_resize(payload):
+                            proc.setwinsize(*parse_resize(payload))
+                        elif kind == TERM_ACK:
+                            credit.acked(parse_ack(payload))
                 except Exception:
                     pass
             
@@ -661,6 +3237,7 @@ async def ws_terminal(websocket: WebSocket):
                 universal_newlines=False,
                 creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0
             )
+            loop = asyncio.get_running_loop()
             
             def read_output():
                 try:
@@ -668,10 +3245,12 @@ async def ws_terminal(websocket: WebSocket):
                         data = proc.stdout.read(1024)
                         if data:
                             try:
+                                asyncio.run_coroutine_threadsafe(credit.wait(), loop).result()
                                 asyncio.run_coroutine_threadsafe(
-                                    websocket.send_text(data.decode('utf-8', errors='replace')),
-                                    asyncio.get_event_loop()
+                                    websocket.send_bytes(terminal_frame(TERM_DATA, data)),
+                                    loop
                                 ).result(timeout=1.0)
+                                loop.call_soon_threadsafe(credit.sent, len(data))
                             except Exception:
                                 break
                 except Exception:
@@ -682,12 +3261,15 @@ async def ws_terminal(websocket: WebSocket):
             
             try:
                 while proc.poll() is None:
-                    data = await websocket.receive_text()
-                    if not data.startswith('RESIZE:'):
-                        proc.stdin.write(data.encode('utf-8', errors='replace'))
+                    frame = await receive_terminal_frame(websocket)
+                    if frame is None:
+                        break
+                    kind, payload = frame
+                    if kind == TERM_DATA:
+                        proc.stdin.write(payload)
                         proc.stdin.flush()
-            except WebSocketDisconnect:
-                pass
+                    elif kind == TERM_ACK:
+                        credit.acked(parse_ack(payload))
             finally:
                 proc.kill()
         finally:
@@ -699,79 +3281,162 @@ async def ws_terminal(websocket: WebSocket):
                 pass
             
     else:
-        # Linux/Mac: Use PTY (already robust)
-        import pty
-        import select
-        import struct
-        import fcntl
-        import termios
-        
-        shell = os.environ.get('SHELL', '/bin/bash')
-        
-        pid, fd = pty.fork()
+        # Linux/Mac: attach to a persistent session, reattaching when the client names one still alive
+        session = terminal_sessions.get(websocket.query_params.get('session_id')) or terminal_sessions.create()
+        viewer = TerminalViewer(websocket)
         
-        if pid == 0:
-            # Child process
-            try:
-                os.execvp(shell, [shell])
-            except Exception:
-                sys.exit(1)
+        async def receive_from_client():
+            while True:
+                frame = await receive_terminal_frame(websocket)
+                if frame is None:
+                    break
+                session.handle(viewer, *frame)
         
-        # Parent process
+        tasks = [asyncio.create_task(receive_from_client()), asyncio.create_task(session.closed.wait())]
         try:
-            # Set initial terminal size
-            fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack('HHHH', 24, 80, 0, 0))
-            
-            # Set non-blocking
-            fl = fcntl.fcntl(fd, fcntl.F_GETFL)
-            fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
-            
-            async def read_from_pty():
-                loop = asyncio.get_event_loop()
-                while True:
-                    try:
-                        ready, _, _ = await loop.run_in_executor(
-                            None, 
-                            lambda: select.select([fd], [], [], 0.1)
-                        )
-                        if ready:
-                            data = os.read(fd, 4096)
-                            if not data:
-                                break
-                            await websocket.send_text(data.decode('utf-8', errors='replace'))
-                    except OSError:
-                        break
-                    except Exception:
-                        break
-            
-            async def write_to_pty():
-                while True:
-                    try:
-                        data = await websocket.receive_text()
-                        if data.startswith('RESIZE:'):
-                            try:
-                                _, rows, cols = data.split(':')
-                                fcntl.ioctl(fd, termios.TIOCSWINSZ, 
-                                          struct.pack('HHHH', int(rows), int(cols), 0, 0))
-                            except Exception:
-                                pass
-                        else:
-                            os.write(fd, data.encode('utf-8'))
-                    except WebSocketDisconnect:
-                        break
-                    except Exception:
-                        break
-            
-            await asyncio.gather(read_from_pty(), write_to_pty(), return_exceptions=True)
-        
+            await session.attach(viewer)
+            # Ends when the client leaves or the shell exits; leaving keeps the shell for a later reattach
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        except Exception:
+            pass
         finally:
+            session.detach(viewer)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
             try:
-                os.close(fd)
-                os.kill(pid, signal.SIGTERM)
-                os.waitpid(pid, 0)
+                await websocket.close()
             except Exception:
                 pass
 
+def mux_frame(kind: int, channel_id: int, payload: bytes = b'') -> bytes:
+    return struct.pack('>BH', kind, channel_id) + payload
+
+class MuxChannel(TerminalViewer):
+    """A terminal session's view on a multiplexed connection."""
+
+    def __init__(self, mux: 'TerminalMux', channel_id: int, session: TerminalSession):
+        super().__init__(mux.websocket)
+        self.mux = mux
+        self.id = channel_id
+        self.session = session
+        self.outbox = deque()
+        self.scheduled = False
+        self.watcher = None
+
+    async def send(self, kind: int, payload: bytes = b''):
+        # Queued for the connection's sender; credit keeps the queue within the window
+        self.outbox.append(mux_frame(kind, self.id, payload))
+        if kind == TERM_DATA:
+            self.credit.sent(len(payload))
+        self.mux.schedule(self)
+
+class TerminalMux:
+    """Any number of terminal sessions over one WebSocket, one channel each.
+
+    Every channel queues its own frames and the sender takes one frame from
+    each channel with output in turn, so a channel flooding output can't
+    hold up the others. Per-channel credit still paces each session.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.channels: Dict[int, MuxChannel] = {}
+        self._turns = deque()
+        self._wakeup = asyncio.Event()
+
+    def schedule(self, channel: MuxChannel):
+        if not channel.scheduled:
+            channel.scheduled = True
+            self._turns.append(channel)
+            self._wakeup.set()
+
+    async def send_loop(self):
+        while True:
+            while not self._turns:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            channel = self._turns.popleft()
+            if not channel.outbox:
+                channel.scheduled = False
+                continue
+            frame = channel.outbox.popleft()
+            if channel.outbox:
+                self._turns.append(channel)
+            else:
+                channel.scheduled = False
+            await self.websocket.send_bytes(frame)
+
+    async def handle(self, kind: int, payload: bytes):
+        """Act on a frame from the client."""
+        if len(payload) < 2:
+            return
+        channel_id, = struct.unpack('>H', payload[:2])
+        body = payload[2:]
+        if kind == TERM_OPEN:
+            await self.open(channel_id, body.decode('ascii', errors='ignore'))
+            return
+        channel = self.channels.get(channel_id)
+        if channel is not None:
+            channel.session.handle(channel, kind, body)
+
+    async def open(self, channel_id: int, session_id: str):
+        self.detach(channel_id)
+        session = terminal_sessions.get(session_id) or terminal_sessions.create()
+        channel = MuxChannel(self, channel_id, session)
+        self.channels[channel_id] = channel
+        channel.watcher = asyncio.create_task(self._watch(channel))
+        await session.attach(channel)
+
+    async def _watch(self, channel: MuxChannel):
+        await channel.session.closed.wait()
+        if self.channels.get(channel.id) is channel:
+            del self.channels[channel.id]
+            await channel.send(TERM_CLOSE)
+
+    def detach(self, channel_id: int):
+        channel = self.channels.pop(channel_id, None)
+        if channel is not None:
+            channel.watcher.cancel()
+            channel.outbox.clear()
+            channel.session.detach(channel)
+
+    def close(self):
+        for channel_id in list(self.channels):
+            self.detach(channel_id)
+
+@app.websocket("/api/ws/terminal-mux")
+async def ws_terminal_mux(websocket: WebSocket):
+    """All of a client's terminals over one WebSocket, one channel per session"""
+    await websocket.accept()
+    if sys.platform == 'win32':
+        # Sessions need a POSIX PTY; Windows clients use one /api/ws/terminal connection per terminal
+        await websocket.close(code=TERMINAL_MUX_UNSUPPORTED)
+        return
+    
+    mux = TerminalMux(websocket)
+    
+    async def receive_from_client():
+        while True:
+            frame = await receive_terminal_frame(websocket)
+            if frame is None:
+                break
+            await mux.handle(*frame)
+    
+    tasks = [asyncio.create_task(receive_from_client()), asyncio.create_task(mux.send_loop())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Sessions stay alive for a reconnect to reattach
+        mux.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -804,9 +3469,13 @@ if STREAM_AVAILABLE:
 
 @app.on_event("startup")
 async def startup_db():
+    await db_pool.open()
     await init_db()
-    logger.info(f"Database initialized at {DB_PATH}")
-    logger.info(f"Custom blocks storage at {CUSTOM_BLOCKS_PATH}")
+    await exec_pool.start()
+    await asyncio.to_thread(introspector.prune)
+    # Built in the background; the first lookup waits for it if needed
+    asyncio.create_task(package_index.refresh())
+    logger.info(f"Database initialized at {DB_PATH} ({db_pool.readers} reader connections, WAL)")
     
     # Check if frontend build exists
     if FRONTEND_BUILD_PATH.exists():
@@ -817,6 +3486,12 @@ async def startup_db():
         logger.warning("Run 'cd frontend && yarn build' to create production build")
         logger.warning("For now, run frontend separately: cd frontend && yarn start")
 
+@app.on_event("shutdown")
+async def shutdown_db():
+    terminal_sessions.close_all()
+    await exec_pool.close()
+    await db_pool.close()
+
 # Mount static files (frontend build) - AFTER all API routes
 if FRONTEND_BUILD_PATH.exists():
     # Serve static files (JS, CSS, images)
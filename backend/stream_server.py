@@ -33,6 +33,10 @@ except ImportError:
 # Router
 stream_router = APIRouter(prefix="/api/stream")
 
+# The capture only produces frames when the screen changes; resend the last
+# one after this many seconds so an idle desktop doesn't stall the stream
+FRAME_KEEPALIVE = 1.0
+
 # ----------------------------------------------------------------------
 # Video track (ORIGINAL from stream.py)
 # ----------------------------------------------------------------------
@@ -47,6 +51,12 @@ class UncappedStreamTrack(VideoStreamTrack):
         self._running = True
         self.show_local_cursor = True
         self.monitor_idx = monitor_idx
+        # Single-slot mailbox: the capture thread drops in the newest frame,
+        # replacing one recv hasn't taken yet, and wakes recv through the loop
+        self._loop = asyncio.get_event_loop()
+        self._mailbox = None
+        self._mailbox_lock = threading.Lock()
+        self._frame_ready = asyncio.Event()
         self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
         self._capture_thread.start()
 
@@ -58,28 +68,55 @@ class UncappedStreamTrack(VideoStreamTrack):
 
     def stop(self):
         self._running = False
+        # Let a waiting recv see the track has stopped
+        self._frame_ready.set()
         if self._capture_thread.is_alive():
             self._capture_thread.join(timeout=1.0)
 
     def _capture_loop(self):
         while self._running:
             try:
+                # Blocks until the camera has a new frame
                 frame = self.camera.get_latest_frame()
-                if frame is not None:
-                    self._latest_frame = frame
             except Exception as e:
                 print(f"[Capture thread] Error: {e}")
-            time.sleep(0.001)
+                time.sleep(0.1)
+                continue
+            if frame is None or not self._running:
+                continue
+            with self._mailbox_lock:
+                waiting = self._mailbox is not None
+                self._mailbox = frame
+            # A frame already waiting has its wake-up scheduled; one per slot is enough
+            if not waiting:
+                try:
+                    self._loop.call_soon_threadsafe(self._frame_ready.set)
+                except RuntimeError:
+                    # Event loop closed
+                    break
 
-    async def recv(self):
-        pts = int((time.time() - self._start_time) * 1000)
-        frame = self._latest_frame
-        while frame is None and self._running:
-            await asyncio.sleep(0.001)
-            frame = self._latest_frame
+    async def _next_frame(self):
+        """Wait for the next captured frame, or repeat the last one after FRAME_KEEPALIVE."""
+        while self._running:
+            try:
+                await asyncio.wait_for(self._frame_ready.wait(), FRAME_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if self._latest_frame is not None:
+                    return self._latest_frame
+                continue
+            self._frame_ready.clear()
+            with self._mailbox_lock:
+                frame, self._mailbox = self._mailbox, None
+            if frame is not None:
+                self._latest_frame = frame
+                return frame
+        return None
 
+    async def recv(self):
+        frame = await self._next_frame()
         if frame is None:
             return None
+        pts = int((time.time() - self._start_time) * 1000)
 
         img = frame.copy()
 
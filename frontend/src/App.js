@@ -27,6 +27,42 @@ const API = '/api';
 // Log the API URL for debugging
 console.log('🔗 API URL:', API, '(relative - uses current host)');
 
+// Identifies this tab to the server for fair run scheduling and stopping runs
+const SESSION_ID = window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+// Single splice turning `prev` into `next` (common prefix/suffix trimmed)
+const diffWorkspaceXml = (prev, next) => {
+  const max = Math.min(prev.length, next.length);
+  let start = 0;
+  while (start < max && prev[start] === next[start]) start++;
+  let tail = 0;
+  while (tail < max - start && prev[prev.length - 1 - tail] === next[next.length - 1 - tail]) tail++;
+  return { start, end: prev.length - tail, text: next.slice(start, next.length - tail) };
+};
+
+// POST `body` and call `onItem` for each line of a JSON-lines response as it arrives
+const streamJsonLines = async (url, body, onItem) => {
+  const res = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body),
+  });
+  if (!res.ok) throw new Error(`Request failed with status code ${res.status}`);
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+    const lines = buffered.split('\n');
+    buffered = lines.pop();
+    for (const line of lines) {
+      if (line.trim()) onItem(JSON.parse(line));
+    }
+    if (done) break;
+  }
+};
+
 function App() {
   const [currentCode, setCurrentCode] = useState('');
   const [isRunning, setIsRunning] = useState(false);
@@ -49,18 +85,56 @@ function App() {
 
   const workspaceRef = useRef(null);
   const blocklyRef = useRef(null);
+  // Last workspace the server acknowledged, used as the base for delta saves
+  const savedWorkspaceRef = useRef({ id: null, revision: 0, xml: '' });
+
+  // ETag of the custom block listing we hold, as last announced by the server
+  const customBlocksEtagRef = useRef(null);
 
-  // Load custom blocks on mount
+  // Load custom blocks on mount, then follow additions/deletions pushed by the server
   useEffect(() => {
     loadCustomBlocks();
+
+    let socket = null;
+    let retryTimer = null;
+    let unmounted = false;
+    const connect = () => {
+      socket = new WebSocket(`${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}/api/ws/custom-blocks`);
+      socket.onmessage = (event) => {
+        const msg = JSON.parse(event.data);
+        if (msg.type === 'hello' || msg.type === 'resync') {
+          if (msg.etag !== customBlocksEtagRef.current) loadCustomBlocks();
+          return;
+        }
+        if (msg.type === 'added') {
+          setCustomBlocks(prev => prev.some(b => b.id === msg.block.id) ? prev : [...prev, msg.block]);
+        } else if (msg.type === 'deleted') {
+          setCustomBlocks(prev => prev.filter(b => b.id !== msg.id));
+        }
+        customBlocksEtagRef.current = msg.etag;
+      };
+      socket.onclose = () => {
+        if (!unmounted) retryTimer = setTimeout(connect, 3000);
+      };
+    };
+    connect();
+
+    return () => {
+      unmounted = true;
+      clearTimeout(retryTimer);
+      socket?.close();
+    };
   }, []);
 
+  useEffect(() => {
+    rebuildMyBlocksCategory(customBlocks);
+  }, [customBlocks]);
+
   const loadCustomBlocks = async () => {
     try {
       const res = await axios.get(`${API}/custom-blocks`);
-      const blocks = res.data.blocks || [];
-      setCustomBlocks(blocks);
-      rebuildMyBlocksCategory(blocks);
+      customBlocksEtagRef.current = res.headers.etag || null;
+      setCustomBlocks(res.data.blocks || []);
     } catch (e) {
       // ignore on load failure
     }
@@ -113,19 +187,18 @@ function App() {
       : currentCode;
 
     try {
-      const res = await axios.post(`${API}/scanner/scan-imports`, { code: fullCode });
-      const imports = res.data.imports || [];
-
+      // Modules arrive as they resolve; show each one's blocks right away
+      const imports = [];
       const newCategories = [];
-      for (const mod of imports) {
-        if (!mod.available) continue;
+      await streamJsonLines(`${API}/scanner/scan-imports/stream`, { code: fullCode, session_id: SESSION_ID }, (mod) => {
+        imports.push(mod);
+        if (!mod.available) return;
         const hasSomething = (mod.functions?.length > 0) || (mod.classes?.length > 0) || (mod.constants?.length > 0);
-        if (!hasSomething) continue;
-
-        const category = registerImportBlocks(mod);
-        newCategories.push(category);
-      }
+        if (!hasSomething) return;
 
+        newCategories.push(registerImportBlocks(mod));
+        setDynamicCategories([...newCategories]);
+      });
       setDynamicCategories(newCategories);
 
       // Show success in output
@@ -168,7 +241,7 @@ function App() {
       : currentCode;
 
     try {
-      const res = await axios.post(`${API}/execute`, { code: fullCode });
+      const res = await axios.post(`${API}/execute`, { code: fullCode, session_id: SESSION_ID });
       const lines = [];
       if (res.data.stdout) {
         res.data.stdout.split('\n').forEach(line => {
@@ -180,25 +253,49 @@ function App() {
           if (line) lines.push({ type: 'stderr', text: line });
         });
       }
+      const usage = [`${res.data.execution_time.toFixed(3)}s`];
+      if (res.data.cpu_time != null) usage.push(`cpu ${res.data.cpu_time.toFixed(3)}s`);
+      if (res.data.peak_rss != null) usage.push(`${(res.data.peak_rss / (1024 * 1024)).toFixed(1)} MB peak`);
       lines.push({
         type: 'system',
-        text: `--- Process exited with code ${res.data.exit_code} (${res.data.execution_time.toFixed(3)}s) ---`
+        text: `--- Process exited with code ${res.data.exit_code} (${usage.join(', ')}) ---`
       });
 
       setOutput({ lines, exitCode: res.data.exit_code, executionTime: res.data.execution_time });
     } catch (e) {
-      setOutput({ lines: [{ type: 'stderr', text: `Error: ${e.message}` }], exitCode: -1, executionTime: 0 });
+      const text = e.response?.status === 429
+        ? 'Server is busy running other programs, try again in a moment.'
+        : `Error: ${e.message}`;
+      setOutput({ lines: [{ type: 'stderr', text }], exitCode: -1, executionTime: 0 });
     } finally {
       setIsRunning(false);
     }
   }, [currentCode, isRunning, customBlocks]);
 
   const handleStop = useCallback(async () => {
-    try { await axios.post(`${API}/execute/stop`); } catch (e) { /* ignore */ }
+    try { await axios.post(`${API}/execute/stop`, { session_id: SESSION_ID }); } catch (e) { /* ignore */ }
     setIsRunning(false);
   }, []);
 
   // ─── Save project ─────────────────────────────────────────────────────────
+  const putWorkspace = async (id, xml, extra = {}) => {
+    const saved = savedWorkspaceRef.current;
+    let res;
+    if (saved.id === id && saved.revision > 0) {
+      try {
+        res = await axios.put(`${API}/projects/${id}`, {
+          ...extra,
+          workspace_delta: { base_revision: saved.revision, edits: [diffWorkspaceXml(saved.xml, xml)] },
+        });
+      } catch (e) {
+        // Saved elsewhere since our base revision: fall back to a full save
+        if (e.response?.status !== 409) throw e;
+      }
+    }
+    if (!res) res = await axios.put(`${API}/projects/${id}`, { ...extra, workspace_xml: xml });
+    savedWorkspaceRef.current = { id, revision: res.data.revision, xml };
+  };
+
   const handleSave = useCallback(async () => {
     const ws = blocklyRef.current?.getWorkspace?.();
     const xml = ws ? getWorkspaceXml(ws) : '';
@@ -206,19 +303,20 @@ function App() {
 
     if (projectId) {
       try {
-        await axios.put(`${API}/projects/${projectId}`, { name: projectName, workspace_xml: xml });
+        await putWorkspace(projectId, xml, { name: projectName });
       } catch (e) { console.error('Failed to save project'); }
     } else {
       try {
         const res = await axios.post(`${API}/projects`, { name: projectName });
         setProjectId(res.data.id);
-        await axios.put(`${API}/projects/${res.data.id}`, { workspace_xml: xml });
+        await putWorkspace(res.data.id, xml);
       } catch (e) { console.error('Failed to create project'); }
     }
   }, [projectId, projectName]);
 
   const handleLoadProject = useCallback((project) => {
     setProjectId(project.id);
+    savedWorkspaceRef.current = { id: project.id, revision: project.revision || 0, xml: project.workspace_xml || '' };
     setProjectName(project.name);
     const ws = blocklyRef.current?.getWorkspace?.();
     if (project.workspace_xml && ws) {
@@ -233,6 +331,7 @@ function App() {
 
   const handleNewProject = useCallback((project) => {
     setProjectId(project.id);
+    savedWorkspaceRef.current = { id: project.id, revision: project.revision || 0, xml: '' };
     setProjectName(project.name);
     const ws = blocklyRef.current?.getWorkspace?.();
     if (ws) ws.clear();
@@ -241,10 +340,9 @@ function App() {
 
   // ─── My Blocks callback ───────────────────────────────────────────────────
   const handleBlockCreated = useCallback((newBlock) => {
-    const updatedBlocks = [...customBlocks, newBlock];
-    setCustomBlocks(updatedBlocks);
-    rebuildMyBlocksCategory(updatedBlocks);
-  }, [customBlocks]);
+    // The server also announces it over /api/ws/custom-blocks; add it only once
+    setCustomBlocks(prev => prev.some(b => b.id === newBlock.id) ? prev : [...prev, newBlock]);
+  }, []);
 
   const bottomTabs = [
     { id: 'output', label: 'Output', icon: Code },
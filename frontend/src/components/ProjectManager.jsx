@@ -13,12 +13,15 @@ export const ProjectManager = ({ isOpen, onClose, onLoadProject, onNewProject })
   const [search, setSearch] = useState('');
   const [creating, setCreating] = useState(false);
   const [newName, setNewName] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
 
-  const fetchProjects = useCallback(async () => {
+  // Summaries only: the workspace XML is fetched when a project is opened
+  const fetchProjects = useCallback(async (cursor = null) => {
     setLoading(true);
     try {
-      const res = await axios.get(`${API}/projects`);
-      setProjects(res.data);
+      const res = await axios.get(`${API}/projects/summary`, { params: cursor ? { cursor } : {} });
+      setProjects(prev => cursor ? [...prev, ...res.data.projects] : res.data.projects);
+      setNextCursor(res.data.next_cursor);
     } catch (e) {
       console.error('Failed to load projects');
     } finally {
@@ -43,6 +46,16 @@ export const ProjectManager = ({ isOpen, onClose, onLoadProject, onNewProject })
     }
   };
 
+  const handleOpen = async (id) => {
+    try {
+      const res = await axios.get(`${API}/projects/${id}`);
+      onLoadProject(res.data);
+      onClose();
+    } catch (e) {
+      console.error('Failed to open project');
+    }
+  };
+
   const handleDelete = async (id) => {
     try {
       await axios.delete(`${API}/projects/${id}`);
@@ -139,7 +152,7 @@ export const ProjectManager = ({ isOpen, onClose, onLoadProject, onNewProject })
 
         {/* Project List */}
         <div className="max-h-72 overflow-y-auto">
-          {loading ? (
+          {loading && projects.length === 0 ? (
             <div className="flex items-center justify-center py-12">
               <Loader2 size={18} className="animate-spin" style={{ color: '#52525b' }} />
             </div>
@@ -156,7 +169,7 @@ export const ProjectManager = ({ isOpen, onClose, onLoadProject, onNewProject })
                 key={project.id}
                 className="flex items-center justify-between px-5 py-3 hover:bg-white/[0.02] cursor-pointer group"
                 style={{ borderBottom: '1px solid #1a1a1f' }}
-                onClick={() => { onLoadProject(project); onClose(); }}
+                onClick={() => handleOpen(project.id)}
               >
                 <div className="flex items-center gap-3">
                   <FileCode size={14} style={{ color: '#06b6d4' }} />
@@ -182,6 +195,17 @@ export const ProjectManager = ({ isOpen, onClose, onLoadProject, onNewProject })
               </div>
             ))
           )}
+          {nextCursor && (
+            <button
+              data-testid="load-more-projects-btn"
+              onClick={() => fetchProjects(nextCursor)}
+              disabled={loading}
+              className="w-full py-2 text-[10px] hover:bg-white/[0.02]"
+              style={{ color: '#52525b' }}
+            >
+              {loading ? 'Loading...' : 'Load more'}
+            </button>
+          )}
         </div>
       </div>
     </div>
@@ -11,18 +11,20 @@ export const SaveAsModal = ({ isOpen, onClose, code }) => {
   const [currentPath, setCurrentPath] = useState('/tmp');
   const [filename, setFilename] = useState('main.py');
   const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [saving, setSaving] = useState(false);
   const [saved, setSaved] = useState(false);
   const [error, setError] = useState('');
 
-  const loadDir = useCallback(async (path) => {
-    setLoading(true);
+  const loadDir = useCallback(async (path, cursor = null) => {
+    if (!cursor) setLoading(true);
     setError('');
     try {
-      const res = await axios.post(`${API}/files/list-dir`, { path });
+      const res = await axios.post(`${API}/files/list-dir`, { path, cursor });
       setCurrentPath(res.data.current);
-      setItems(res.data.items);
+      setItems(prev => cursor ? [...prev, ...res.data.items] : res.data.items);
+      setNextCursor(res.data.next_cursor || null);
     } catch (e) {
       setError(e.response?.data?.detail || 'Failed to read directory');
       setItems([]);
@@ -43,11 +45,12 @@ export const SaveAsModal = ({ isOpen, onClose, code }) => {
     setSaving(true);
     setError('');
     try {
-      const res = await axios.post(`${API}/files/save`, {
-        code: code || '',
-        filepath: currentPath,
-        filename: filename.trim(),
-      });
+      // Sent as a raw body so large generated files stream straight to disk
+      const res = await axios.post(
+        `${API}/files/save-stream`,
+        new Blob([code || ''], { type: 'text/x-python' }),
+        { params: { filepath: currentPath, filename: filename.trim() } },
+      );
       setSaved(true);
       setTimeout(() => { onClose(); setSaved(false); }, 1500);
     } catch (e) {
@@ -155,6 +158,15 @@ export const SaveAsModal = ({ isOpen, onClose, code }) => {
                     <span className="text-xs font-mono" style={{ color: '#a1a1aa' }}>{item.name}</span>
                   </div>
                 ))}
+                {nextCursor && (
+                  <div
+                    data-testid="save-as-load-more"
+                    className="flex items-center justify-center px-3 py-2 cursor-pointer hover:bg-white/[0.03]"
+                    onClick={() => loadDir(currentPath, nextCursor)}
+                  >
+                    <span className="text-xs" style={{ color: '#52525b' }}>Show more</span>
+                  </div>
+                )}
                 {dirs.length === 0 && files.length === 0 && (
                   <div className="flex items-center justify-center py-6">
                     <span className="text-xs" style={{ color: '#3f3f46' }}>Empty directory</span>
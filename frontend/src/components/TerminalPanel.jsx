@@ -4,15 +4,96 @@ import { Terminal } from '@xterm/xterm';
 import { FitAddon } from '@xterm/addon-fit';
 import '@xterm/xterm/css/xterm.css';
 
+// Terminal frames are binary: one type byte, then the payload (see ws_terminal in backend/server.py).
+// On the multiplexed socket a uint16 channel id, the tab id here, sits between the two.
+const TERM_DATA = 0;
+const TERM_RESIZE = 1;
+const TERM_ACK = 2;
+const TERM_SESSION = 3;
+const TERM_CLOSE = 4;
+const TERM_OPEN = 5;
+// The server closes the multiplexed socket with this when it can't serve it (Windows)
+const MUX_UNSUPPORTED = 4001;
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+// Open tabs and their server-side session ids, so a reload reattaches to the same shells
+const STORAGE_KEY = 'pyforge.terminals';
+
+const loadSavedTerminals = () => {
+  try {
+    const saved = JSON.parse(sessionStorage.getItem(STORAGE_KEY));
+    if (saved && saved.tabs && saved.tabs.length) return saved;
+  } catch (e) {
+    // Fall through to a fresh tab
+  }
+  return { tabs: [{ id: 1, name: 'Terminal 1' }], sessions: {} };
+};
+
+const buildFrame = (kind, payload, channel) => {
+  const header = channel === undefined ? 1 : 3;
+  const frame = new Uint8Array(header + payload.length);
+  frame[0] = kind;
+  if (channel !== undefined) {
+    new DataView(frame.buffer).setUint16(1, channel);
+  }
+  frame.set(payload, header);
+  return frame;
+};
+
+const encodeResize = (rows, cols) => {
+  const view = new DataView(new ArrayBuffer(4));
+  view.setUint16(0, rows);
+  view.setUint16(2, cols);
+  return new Uint8Array(view.buffer);
+};
+
+const encodeAck = (size) => {
+  const view = new DataView(new ArrayBuffer(4));
+  view.setUint32(0, size);
+  return new Uint8Array(view.buffer);
+};
+
 export const TerminalPanel = () => {
-  const [terminals, setTerminals] = useState([{ id: 1, name: 'Terminal 1' }]);
-  const [activeTerminal, setActiveTerminal] = useState(1);
+  const [saved] = useState(loadSavedTerminals);
+  const [terminals, setTerminals] = useState(saved.tabs);
+  const [activeTerminal, setActiveTerminal] = useState(saved.tabs[0].id);
+  const sessionIdsRef = useRef(saved.sessions);
+  const tabsRef = useRef(saved.tabs);
   const terminalsRef = useRef({});
   const containerRefs = useRef({});
-  const wsRefs = useRef({});
   const fitAddonsRef = useRef({});
+  // All tabs share one socket; wsRefs only holds per-tab sockets when the server can't multiplex
+  const muxRef = useRef(null);
+  const useMuxRef = useRef(true);
+  const wsRefs = useRef({});
 
-  const wsUrl = `${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}/api/ws/terminal`;
+  const wsBase = `${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}`;
+  const wsUrl = `${wsBase}/api/ws/terminal`;
+  const muxUrl = `${wsBase}/api/ws/terminal-mux`;
+
+  const saveTerminals = () => {
+    sessionStorage.setItem(STORAGE_KEY, JSON.stringify({ tabs: tabsRef.current, sessions: sessionIdsRef.current }));
+  };
+
+  useEffect(() => {
+    tabsRef.current = terminals;
+    saveTerminals();
+  }, [terminals]);
+
+  // Drop the shared socket when the panel goes away; sessions stay on the server for a reattach
+  useEffect(() => () => {
+    const socket = muxRef.current;
+    muxRef.current = null;
+    if (socket) socket.close();
+  }, []);
+
+  const sendFrame = (id, kind, payload = new Uint8Array(0)) => {
+    const socket = useMuxRef.current ? muxRef.current : wsRefs.current[id];
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      socket.send(buildFrame(kind, payload, useMuxRef.current ? id : undefined));
+    }
+  };
 
   // Create a new terminal tab
   const createTerminal = () => {
@@ -25,11 +106,14 @@ export const TerminalPanel = () => {
   const closeTerminal = (id) => {
     if (terminals.length === 1) return; // Keep at least one terminal
     
-    // Close WebSocket
-    if (wsRefs.current[id]) {
-      wsRefs.current[id].close();
+    // End the shell too, rather than leaving it to idle out on the server
+    sendFrame(id, TERM_CLOSE);
+    const socket = wsRefs.current[id];
+    if (socket) {
+      socket.close();
       delete wsRefs.current[id];
     }
+    delete sessionIdsRef.current[id];
     
     // Dispose terminal
     if (terminalsRef.current[id]) {
@@ -90,18 +174,138 @@ export const TerminalPanel = () => {
     terminalsRef.current[id] = term;
     fitAddonsRef.current[id] = fitAddon;
 
-    // Connect WebSocket
-    const socket = new WebSocket(wsUrl);
+    // Handle terminal input
+    term.onData((data) => {
+      sendFrame(id, TERM_DATA, textEncoder.encode(data));
+    });
+
+    // Handle terminal resize
+    const handleResize = () => {
+      if (fitAddonsRef.current[id] && terminalsRef.current[id]) {
+        fitAddonsRef.current[id].fit();
+        sendFrame(id, TERM_RESIZE, encodeResize(term.rows, term.cols));
+      }
+    };
+    
+    window.addEventListener('resize', handleResize);
+
+    connectTerminal(id);
+
+    return () => {
+      window.removeEventListener('resize', handleResize);
+      const socket = wsRefs.current[id];
+      if (socket && socket.readyState === WebSocket.OPEN) {
+        socket.close();
+      }
+      term.dispose();
+    };
+  };
+
+  // A frame for one tab, from its channel on the shared socket or from its own socket
+  const handleFrame = (id, kind, payload) => {
+    const term = terminalsRef.current[id];
+    if (!term) return;
+
+    if (kind === TERM_SESSION) {
+      const attachedId = textDecoder.decode(payload);
+      if (attachedId === sessionIdsRef.current[id]) {
+        // Same shell: its scrollback is replayed next, so start from a clean screen
+        term.reset();
+      } else if (sessionIdsRef.current[id]) {
+        term.writeln('\x1b[1;33m✗ Previous session ended, started a new shell\x1b[0m');
+      }
+      sessionIdsRef.current[id] = attachedId;
+      saveTerminals();
+    } else if (kind === TERM_DATA) {
+      // Acknowledge once xterm has processed it; the server stops reading the shell when too far ahead
+      term.write(payload, () => sendFrame(id, TERM_ACK, encodeAck(payload.length)));
+    } else if (kind === TERM_CLOSE) {
+      // The shell exited: start a fresh one on the same channel
+      term.writeln('\r\n\x1b[1;33m✗ Shell exited\x1b[0m');
+      delete sessionIdsRef.current[id];
+      openChannel(id);
+    }
+  };
+
+  // Attach a tab's channel to its saved session, or to a new shell
+  const openChannel = (id) => {
+    const term = terminalsRef.current[id];
+    if (!term) return;
+    sendFrame(id, TERM_OPEN, textEncoder.encode(sessionIdsRef.current[id] || ''));
+    sendFrame(id, TERM_RESIZE, encodeResize(term.rows, term.cols));
+    term.writeln('\x1b[1;32m✓ Connected to terminal\x1b[0m');
+  };
+
+  const connectMux = () => {
+    const socket = new WebSocket(muxUrl);
+    socket.binaryType = 'arraybuffer';
+    muxRef.current = socket;
+    let connected = false;
+
+    socket.onopen = () => {
+      connected = true;
+      Object.keys(terminalsRef.current).forEach(id => openChannel(Number(id)));
+    };
+
+    socket.onmessage = (event) => {
+      const frame = new Uint8Array(event.data);
+      const channel = new DataView(event.data).getUint16(1);
+      handleFrame(channel, frame[0], frame.subarray(3));
+    };
+
+    socket.onclose = (event) => {
+      if (muxRef.current !== socket) return;
+      muxRef.current = null;
+      const tabs = Object.keys(terminalsRef.current).map(Number);
+      if (event.code === MUX_UNSUPPORTED) {
+        useMuxRef.current = false;
+        tabs.forEach(connectTerminal);
+        return;
+      }
+      if (connected) {
+        tabs.forEach(id => terminalsRef.current[id].writeln('\r\n\x1b[1;33m✗ Terminal disconnected\x1b[0m'));
+      }
+      // Auto-reconnect after 2 seconds; every tab reattaches to its session
+      setTimeout(() => {
+        if (!muxRef.current && useMuxRef.current && Object.keys(terminalsRef.current).length) {
+          tabs.forEach(id => terminalsRef.current[id] && terminalsRef.current[id].writeln('\r\n\x1b[1;36m↻ Reconnecting...\x1b[0m'));
+          connectMux();
+        }
+      }, 2000);
+    };
+  };
+
+  // Connect a tab to its shell, reattaching to the saved session while the server still has it
+  const connectTerminal = (id) => {
+    const term = terminalsRef.current[id];
+    if (!term) return;
+
+    if (useMuxRef.current) {
+      const mux = muxRef.current;
+      if (!mux) {
+        connectMux();
+      } else if (mux.readyState === WebSocket.OPEN) {
+        openChannel(id);
+      }
+      // Otherwise the socket is still opening and attaches every tab once it is up
+      return;
+    }
+
+    const sessionId = sessionIdsRef.current[id];
+    const socket = new WebSocket(sessionId ? `${wsUrl}?session_id=${encodeURIComponent(sessionId)}` : wsUrl);
+    // PTY output arrives as raw bytes; xterm decodes UTF-8 across frame boundaries
+    socket.binaryType = 'arraybuffer';
     let connected = false;
     
     socket.onopen = () => {
       connected = true;
       term.writeln('\x1b[1;32m✓ Connected to terminal\x1b[0m');
-      socket.send(`RESIZE:${term.rows}:${term.cols}`);
+      sendFrame(id, TERM_RESIZE, encodeResize(term.rows, term.cols));
     };
 
     socket.onmessage = (event) => {
-      term.write(event.data);
+      const frame = new Uint8Array(event.data);
+      handleFrame(id, frame[0], frame.subarray(1));
     };
 
     socket.onerror = () => {
@@ -116,41 +320,14 @@ export const TerminalPanel = () => {
       }
       // Auto-reconnect after 2 seconds
       setTimeout(() => {
-        if (terminalsRef.current[id]) {
+        if (terminalsRef.current[id] && wsRefs.current[id] === socket) {
           term.writeln('\r\n\x1b[1;36m↻ Reconnecting...\x1b[0m');
-          initTerminal(id);
+          connectTerminal(id);
         }
       }, 2000);
     };
 
     wsRefs.current[id] = socket;
-
-    // Handle terminal input
-    term.onData((data) => {
-      if (socket.readyState === WebSocket.OPEN) {
-        socket.send(data);
-      }
-    });
-
-    // Handle terminal resize
-    const handleResize = () => {
-      if (fitAddonsRef.current[id] && terminalsRef.current[id]) {
-        fitAddonsRef.current[id].fit();
-        if (socket.readyState === WebSocket.OPEN) {
-          socket.send(`RESIZE:${term.rows}:${term.cols}`);
-        }
-      }
-    };
-    
-    window.addEventListener('resize', handleResize);
-
-    return () => {
-      window.removeEventListener('resize', handleResize);
-      if (socket.readyState === WebSocket.OPEN) {
-        socket.close();
-      }
-      term.dispose();
-    };
   };
 
   // Initialize terminals when they become active